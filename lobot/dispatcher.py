@@ -0,0 +1,329 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from asyncio import AbstractEventLoop
+from collections import OrderedDict, Counter
+from typing import Optional, Union, Callable, Dict, List, Iterable, Tuple, Pattern
+from types import CoroutineType, ModuleType
+from asyncio import Future
+import contextvars
+import importlib
+import asyncio
+import json
+import sys
+import os
+
+from .plugins.plugin import Plugin, _Bridge
+from .plugin_manager import PluginManager, LazyHandler, compile_manifest
+from .network import Network
+from .irc.state import StateTracker
+from .watcher import FileWatcher, DEFAULT_INTERVAL
+from .resolver import Resolver, DEFAULT_TTL, DEFAULT_CACHE_SIZE
+from .scheduler import TaskScheduler, DEFAULT_MAX_TASKS, DEFAULT_MAX_TASKS_PER_OWNER, DEFAULT_MAX_BACKLOG
+
+
+__all__ = [
+    'Dispatcher'
+]
+
+
+DEFAULT_LOAD_TIMEOUT = 30.0
+_MANIFEST_SUFFIX = '.manifest.json'
+
+
+# The network whose event started the running handler, inherited by any tasks it spawns
+_current_network = contextvars.ContextVar('lobot_network', default=None)
+
+
+class Dispatcher(_Bridge):
+    @property
+    def proto(self):
+        return self._network().proto
+
+    @property
+    def config(self) -> dict:
+        return self._config
+
+    @property
+    def nick(self) -> str:
+        return self._network().nick
+
+    @property
+    def network(self) -> str:
+        return self._network().name
+
+    @property
+    def state(self) -> StateTracker:
+        return self._network().state
+
+    @property
+    def networks(self) -> Dict[str, Network]:
+        return self._networks
+
+    @property
+    def loop(self) -> AbstractEventLoop:
+        return self._loop
+
+    @property
+    def resolver(self) -> Resolver:
+        return self._resolver
+
+    @property
+    def scheduler(self) -> TaskScheduler:
+        return self._scheduler
+
+    @property
+    def handler_timeouts(self) -> Dict[str, int]:
+        return self._handler_timeouts
+
+    def __init__(self, loop: Optional[AbstractEventLoop], working_dir: str):
+        self._loop = loop
+        self._working_dir = working_dir
+        self._plugin_manager = PluginManager()
+        self._handler_timeouts = Counter()
+        self._executors = {}
+        self._networks = OrderedDict()
+        self._watcher = None
+        self._lazy_loads = {}
+        self._reload_config()
+        self._resolver = Resolver(loop, self._config['lobot'].get('dns_ttl', DEFAULT_TTL),
+                                  cache_size=self._config['lobot'].get('dns_cache_size', DEFAULT_CACHE_SIZE))
+        self._scheduler = TaskScheduler(loop,
+                                        max_tasks=self._config['lobot'].get('max_tasks', DEFAULT_MAX_TASKS),
+                                        max_tasks_per_owner=self._config['lobot'].get('max_plugin_tasks',
+                                                                                      DEFAULT_MAX_TASKS_PER_OWNER),
+                                        max_backlog=self._config['lobot'].get('max_task_backlog',
+                                                                              DEFAULT_MAX_BACKLOG),
+                                        pause=self._pause_reading,
+                                        resume=self._resume_reading)
+
+    def _network(self) -> Network:
+        network = _current_network.get()
+        if network is None:
+            # Work not started by a network event, such as on_load, goes to the first network
+            network = next(iter(self._networks.values()))
+        return network
+
+    def _ensure_future(self, coro_or_future: Union[CoroutineType, Future], owner: Optional[Plugin]=None,
+                       network: Optional[Network]=None):
+        self._scheduler.spawn(coro_or_future, owner, network)
+
+    def executor(self, process: bool=False) -> Executor:
+        executor = self._executors.get(process)
+        if executor is None:
+            if process:
+                executor = ProcessPoolExecutor(self._config['lobot'].get('executor_processes'))
+            else:
+                executor = ThreadPoolExecutor(self._config['lobot'].get('executor_threads'))
+            self._executors[process] = executor
+        return executor
+
+    def _pause_reading(self):
+        pass
+
+    def _resume_reading(self):
+        pass
+
+    def _handler_budget(self, plugin: Plugin, handler: Callable) -> Optional[float]:
+        budget = getattr(handler, '_handler_timeout', None)
+        if budget is None:
+            budget = plugin.handler_timeout
+        if budget is None:
+            budget = self._config['lobot'].get('handler_timeout')
+        return budget
+
+    async def _run_handler(self, network: Optional[Network], name: str, budget: Optional[float],
+                           coro: CoroutineType):
+        if network is not None:
+            # Set inside the task so say() and reply() answer on the network the event came from
+            _current_network.set(network)
+        if budget is None:
+            await coro
+            return
+        try:
+            await asyncio.wait_for(coro, budget)
+        except asyncio.TimeoutError:
+            # Cancelling the handler also cancels any HTTP request it is awaiting
+            self._handler_timeouts[name] += 1
+
+    def _ensure_handler(self, handler: Callable, *args, network: Optional[Network]=None):
+        if isinstance(handler, LazyHandler):
+            self._ensure_future(self._run_lazy(handler, args, network))
+            return
+        plugin = handler.__self__
+        coro = handler(*args)
+        budget = self._handler_budget(plugin, handler)
+        if budget is None and network is None:
+            self._ensure_future(coro, plugin)
+        else:
+            name = plugin.__class__.__name__ + '.' + handler.__name__
+            self._ensure_future(self._run_handler(network, name, budget, coro), plugin, network)
+
+    def _reload_config(self):
+        with open(os.path.join(self._working_dir, 'config.json')) as config:
+            self._config = json.load(config, object_pairs_hook=OrderedDict)
+
+    async def _load_plugins(self, modules: List[str]):
+        plugs_path = os.path.join(self._working_dir, self._config['lobot']['plugdir'])
+        if plugs_path not in sys.path:
+            sys.path.append(plugs_path)
+        eager = []
+        for module_path in modules:
+            patterns = self._read_manifest(plugs_path, module_path)
+            if patterns is None:
+                eager.append(module_path)
+            else:
+                # Answerable right away, the import waits for the first matching message
+                self._plugin_manager.add_lazy(module_path, patterns)
+        # Imports run side by side on the thread pool, each within its own time limit
+        imported = await asyncio.gather(*(self._import(module_path) for module_path in eager))
+        self._start_plugins(self._plugin_manager.add_modules(
+            [(module_path, module) for module_path, module in zip(eager, imported) if module is not None]))
+        if self._config['lobot'].get('watch_plugins', False):
+            self._watch_plugins()
+
+    def _read_manifest(self, plugs_path: str, module_path: str) -> Optional[Dict[str, List[Pattern]]]:
+        try:
+            with open(os.path.join(plugs_path, *module_path.split('.')) + _MANIFEST_SUFFIX) as manifest:
+                return compile_manifest(json.load(manifest, object_pairs_hook=OrderedDict))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # The module is then imported up front like any other
+            self._loop.call_exception_handler({
+                'message': 'Ignoring bad manifest of plugin module ' + module_path,
+                'exception': e
+            })
+            return None
+
+    async def _import(self, module_path: str) -> Optional[ModuleType]:
+        timeout = self._config['lobot'].get('plugin_load_timeout', DEFAULT_LOAD_TIMEOUT)
+        try:
+            return await asyncio.wait_for(
+                self._loop.run_in_executor(self.executor(), importlib.import_module, module_path), timeout)
+        except Exception as e:
+            # One slow or broken plugin must not hold back the rest
+            self._loop.call_exception_handler({
+                'message': 'Failed to load plugin module ' + module_path,
+                'exception': e
+            })
+            return None
+
+    def _start_plugins(self, added: List[Tuple[str, List[Plugin]]]):
+        for module_path, plugins in added:
+            for plugin in plugins:
+                plugin._attach(module_path, self)
+        # on_load only runs once every handler table is in place
+        for module_path, plugins in added:
+            for plugin in plugins:
+                self._ensure_handler(plugin.on_load)
+
+    async def _run_lazy(self, lazy: LazyHandler, args: tuple, network: Optional[Network]):
+        loading = self._lazy_loads.get(lazy.module_path)
+        if loading is None:
+            loading = self._lazy_loads[lazy.module_path] = asyncio.ensure_future(self._load_lazy(lazy.module_path))
+        await asyncio.shield(loading)
+        nick, target, message = args[:3]
+        # Matched again against the real handlers, the manifest only decided the module was needed
+        for handler, match in self._plugin_manager.module_matcher(lazy.module_path, lazy.attribute).match(message):
+            self._ensure_handler(handler, nick, target, message, match, network=network)
+
+    async def _load_lazy(self, module_path: str):
+        module = await self._import(module_path)
+        if module is None:
+            # Stop the manifest from matching a module that cannot be loaded
+            self._plugin_manager.unload_module(module_path)
+            return
+        self._start_plugins(self._plugin_manager.add_modules([(module_path, module)]))
+        if self._watcher is not None:
+            self._watch_plugins()
+
+    def _watch_plugins(self):
+        if self._watcher is not None:
+            self._watcher.close()
+        paths = {}
+        for module_path, module in self._plugin_manager.modules:
+            filename = getattr(module.module, '__file__', None)
+            if filename is not None:
+                paths[filename] = module_path
+        self._watcher = FileWatcher(self._loop, paths, self._reload_modules,
+                                    self._config['lobot'].get('watch_interval', DEFAULT_INTERVAL))
+        self._watcher.start()
+
+    def _reload_modules(self, module_paths: Iterable[str]):
+        # Modules added since startup may live in files the import system has not seen yet
+        importlib.invalidate_caches()
+        for module_path in module_paths:
+            module = self._plugin_manager.module(module_path)
+            old_plugins = module.plugins if module is not None else []
+            try:
+                plugins = self._plugin_manager.load_module(module_path)
+            except Exception as e:
+                # A broken edit leaves the previous version of the module running
+                self._loop.call_exception_handler({
+                    'message': 'Failed to reload plugin module ' + module_path,
+                    'exception': e
+                })
+                continue
+            # The handler tables were swapped by load_module, only the old instances' work is left
+            for plugin in old_plugins:
+                self._scheduler.cancel(owner=plugin)
+            for plugin in plugins:
+                plugin._attach(module_path, self)
+                self._ensure_handler(plugin.on_load)
+
+    def _unload_modules(self, module_paths: Iterable[str]):
+        for module_path in module_paths:
+            for plugin in self._plugin_manager.unload_module(module_path):
+                self._scheduler.cancel(owner=plugin)
+
+    def _changed_modules(self, old_config: dict, module_paths: Iterable[str]) -> List[str]:
+        # A module is reloaded only when its own config section differs
+        return [module_path for module_path in module_paths
+                if old_config.get(module_path) != self._config.get(module_path)]
+
+    def _process_listeners(self, network: Network, nick: str, target: str, message: str):
+        # Process plugins using the @listen decorator
+        for listener, match in self._plugin_manager.listeners.match(message):
+            self._ensure_handler(listener, nick, target, message, match, network=network)
+
+    def _process_commanders(self, network: Network, nick: str, target: str, message: str):
+        # Check for private messages or messages that start with our nick
+        message, count = network.nick_pattern.subn('', message)
+        if count == 0 and network.nick != target:
+            return
+        message = message.lstrip()
+        # Send on_command message
+        for on_command in self._plugin_manager.handlers('on_command'):
+            self._ensure_handler(on_command, nick, target, message, network=network)
+        # Process plugins using the @command decorator
+        for commander, match in self._plugin_manager.commanders.match(message):
+            self._ensure_handler(commander, nick, target, message, match, network=network)
+
+    def _dispatch_connected(self, network: Network):
+        for on_connected in self._plugin_manager.handlers('on_connected'):
+            self._ensure_handler(on_connected, network=network)
+
+    def _dispatch_disconnected(self, network: Network):
+        # Work started for the lost connection has nowhere to reply to
+        self._scheduler.cancel(tag=network)
+        for on_disconnected in self._plugin_manager.handlers('on_disconnected'):
+            self._ensure_handler(on_disconnected, network=network)
+
+    def _dispatch_join(self, network: Network, nick: str, channel: str):
+        if nick == network.nick:
+            for on_join in self._plugin_manager.handlers('on_join'):
+                self._ensure_handler(on_join, channel, network=network)
+        else:
+            for on_they_join in self._plugin_manager.handlers('on_they_join'):
+                self._ensure_handler(on_they_join, nick, channel, network=network)
+
+    def _dispatch_privmsg(self, network: Network, nick: str, target: str, message: str):
+        if nick == network.nick:
+            return
+        self._process_listeners(network, nick, target, message)
+        self._process_commanders(network, nick, target, message)
+        if target == network.nick:
+            for on_private_msg in self._plugin_manager.handlers('on_private_msg'):
+                self._ensure_handler(on_private_msg, nick, message, network=network)
+        else:
+            for on_msg in self._plugin_manager.handlers('on_msg'):
+                self._ensure_handler(on_msg, nick, target, message, network=network)
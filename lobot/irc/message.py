@@ -1,4 +1,6 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
+from collections import OrderedDict
+import sys
 
 
 __all__ = [
@@ -8,43 +10,153 @@ __all__ = [
 ]
 
 
+# Most traffic comes from a few hundred active users, so their prefixes are parsed once
+PREFIX_CACHE_SIZE = 1024
+
+
+_TAG_ESCAPES = {
+    ':': ';',
+    's': ' ',
+    '\\': '\\',
+    'r': '\r',
+    'n': '\n'
+}
+
+
+def _decode(data: bytes) -> str:
+    return data.decode(errors='replace')
+
+
+def _intern(data: bytes) -> str:
+    return sys.intern(_decode(data))
+
+
+def _unescape_tag_value(value: str) -> str:
+    if '\\' not in value:
+        return value
+    chars = []
+    escaped = False
+    for c in value:
+        if escaped:
+            chars.append(_TAG_ESCAPES.get(c, c))
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        else:
+            chars.append(c)
+    # A trailing lone backslash is dropped
+    return ''.join(chars)
+
+
+def _parse_tags(data: bytes) -> Dict[str, str]:
+    tags = {}
+    for tag in _decode(data).split(';'):
+        if not tag:
+            continue
+        key, _, value = tag.partition('=')
+        tags[key] = _unescape_tag_value(value)
+    return tags
+
+
 class MessageError(Exception):
     pass
 
 
 class Prefix(object):
+    __slots__ = ('_raw', '_nick', '_user', '_host', '_decoded')
+
+    @property
+    def raw(self) -> bytes:
+        return self._raw
+
     @property
     def nick(self) -> Optional[str]:
+        if not self._decoded:
+            self._decode()
         return self._nick
 
     @property
     def username(self) -> Optional[str]:
+        if not self._decoded:
+            self._decode()
         return self._user
 
     @property
     def host(self) -> Optional[str]:
+        if not self._decoded:
+            self._decode()
         return self._host
 
     def __init__(self, data: bytes):
+        self._raw = data
+        self._decoded = False
+
+    def _decode(self):
+        data = self._raw
         nick, user, host = None, None, None
-        if data.find(b'!') != -1:
-            nick, data = data.split(b'!', 1)
-            nick = nick.decode()
-            if data.find(b'@') != -1:
-                user, host = data.split(b'@')
+        bang = data.find(b'!')
+        at = data.find(b'@', bang + 1)
+        if bang != -1:
+            nick = _intern(data[:bang])
+            if at != -1:
+                user = _intern(data[bang + 1:at])
+                host = _intern(data[at + 1:])
             else:
-                user = data
-            user = user.decode()
+                user = _intern(data[bang + 1:])
+        elif at != -1:
+            nick = _intern(data[:at])
+            host = _intern(data[at + 1:])
         else:
-            host = data
+            host = _intern(data)
         self._nick = nick
         self._user = user
-        self._host = host.decode()
+        self._host = host
+        self._decoded = True
+
+
+class _PrefixCache(object):
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, data: bytes) -> Prefix:
+        prefix = self._entries.get(data)
+        if prefix is not None:
+            self._entries.move_to_end(data)
+            return prefix
+        # Prefix is read-only, so one instance can be shared by every message from the same user
+        prefix = self._entries[data] = Prefix(data)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+        return prefix
+
+    def clear(self):
+        self._entries.clear()
+
+
+_prefix_cache = _PrefixCache(PREFIX_CACHE_SIZE)
 
 
 class Message(object):
+    __slots__ = ('_raw', '_tags_end', '_prefix_start', '_prefix_end', '_command', '_offsets', '_tags', '_prefix', '_args')
+
+    @property
+    def raw(self) -> bytes:
+        return self._raw
+
+    @property
+    def tags(self) -> Dict[str, str]:
+        if self._tags is None:
+            if self._tags_end:
+                self._tags = _parse_tags(self._raw[1:self._tags_end])
+            else:
+                self._tags = {}
+        return self._tags
+
     @property
     def prefix(self) -> Optional[Prefix]:
+        if self._prefix is None and self._prefix_end:
+            self._prefix = _prefix_cache.get(self._raw[self._prefix_start:self._prefix_end])
         return self._prefix
 
     @property
@@ -53,24 +165,63 @@ class Message(object):
 
     @property
     def args(self) -> List[str]:
+        if self._args is None:
+            raw = self._raw
+            offsets = self._offsets
+            self._args = [_decode(raw[offsets[i]:offsets[i + 1]]) for i in range(0, len(offsets), 2)]
         return self._args
 
+    @property
+    def arg_count(self) -> int:
+        # Counted from the recorded offsets, so no argument has to be decoded
+        return len(self._offsets) // 2
+
     def __init__(self, data: bytes):
+        self._raw = data
+        self._tags_end = 0
+        self._prefix_start = 0
+        self._prefix_end = 0
+        self._tags = None
+        self._prefix = None
+        self._args = None
+        # Single pass over the line that only records where each part lives
+        length = len(data)
+        pos = 0
         try:
-            prefix = b''
+            # Message has IRCv3 tags
+            if data.startswith(b'@'):
+                pos = self._tags_end = data.index(b' ', 1)
+                while pos < length and data[pos] == 0x20:
+                    pos += 1
             # Message has prefix
-            if data[0] == b':'[0]:
-                prefix, data = data[1:].split(b' ', 1)
+            if data.startswith(b':', pos):
+                self._prefix_start = pos + 1
+                pos = self._prefix_end = data.index(b' ', pos + 1)
+                while pos < length and data[pos] == 0x20:
+                    pos += 1
+            end = data.find(b' ', pos)
+            if end == -1:
+                end = length
+            if end == pos:
+                raise ValueError
+            self._command = data[pos:end].decode('ascii')
+        except (ValueError, UnicodeDecodeError):
+            raise MessageError('Message could not be decoded: ' + _decode(data))
+        offsets = []
+        pos = end
+        while pos < length:
+            if data[pos] == 0x20:
+                pos += 1
+                continue
             # Message has multi-word argument
-            if data.find(b' :') != -1:
-                data, long_arg = data.split(b' :', 1)
-                args = data.split(b' ')
-                args.append(long_arg)
-            else:
-                args = data.split(b' ')
-            if len(prefix) > 0:
-                self._prefix = Prefix(prefix)
-            self._command = args.pop(0).decode()
-            self._args = [arg.decode() for arg in args]
-        except Exception:
-            raise MessageError('Message could not be decoded: ' + data.decode())
+            if data[pos] == 0x3a:
+                offsets.append(pos + 1)
+                offsets.append(length)
+                break
+            end = data.find(b' ', pos)
+            if end == -1:
+                end = length
+            offsets.append(pos)
+            offsets.append(end)
+            pos = end
+        self._offsets = offsets
@@ -1,11 +1,13 @@
-from typing import Union, Optional, List, Any
+from typing import Union, Optional, List, Any, Callable
 from asyncio import Protocol, Transport, Future
 from types import CoroutineType
 from abc import ABC
 import asyncio
+import sys
 
 from .message import Message, Prefix, MessageError
 from .rfc import Command, ReplyCode, ErrorCode
+from .send_queue import SendQueue, DEFAULT_RATE, DEFAULT_BURST
 
 
 __all__ = [
@@ -15,11 +17,61 @@ __all__ = [
 ]
 
 
+MAX_LINE_LENGTH = 8191 + 512
+MAX_MESSAGE_LENGTH = 512
+MAX_NICK_RETRIES = 8
+
+
+_Handler = Callable[['IRCProtocol', Message], CoroutineType]
+
+
 def _chunk_bytes(l: bytes, n: int) -> bytes:
     for i in range(0, len(l), n):
         yield l[i:i + n]
 
 
+def _command_key(command: Union[Command, ReplyCode, ErrorCode, str]) -> str:
+    if isinstance(command, Command):
+        return command.value
+    if isinstance(command, (ReplyCode, ErrorCode, int)):
+        return '%03d' % command
+    return command.upper()
+
+
+def _pack_join(channels: List[str], passwords: Optional[List[str]]=None) -> List[bytes]:
+    # Fill each JOIN up to the message limit, keeping every key on the line of its channel
+    passwords = passwords or []
+    lines = []
+    names = []
+    keys = []
+    length = len(b'JOIN \r\n')
+    for i, channel in enumerate(channels):
+        name = channel.encode()
+        key = passwords[i].encode() if i < len(passwords) else None
+        size = len(name) + (len(key) + 1 if key is not None else 0)
+        if names and length + size + 1 > MAX_MESSAGE_LENGTH:
+            lines.append(_join_line(names, keys))
+            names = []
+            keys = []
+            length = len(b'JOIN \r\n')
+        if names:
+            size += 1
+        names.append(name)
+        if key is not None:
+            keys.append(key)
+        length += size
+    if names:
+        lines.append(_join_line(names, keys))
+    return lines
+
+
+def _join_line(names: List[bytes], keys: List[bytes]) -> bytes:
+    line = b'JOIN ' + b','.join(names)
+    if keys:
+        line += b' ' + b','.join(keys)
+    return line + b'\r\n'
+
+
 def _get_default(l: List[Any], index: int, default: Any=None) -> Any:
     try:
         return l[index]
@@ -27,99 +79,242 @@ def _get_default(l: List[Any], index: int, default: Any=None) -> Any:
         return default
 
 
+class _LineBuffer(object):
+    def __init__(self, max_line_length: int=MAX_LINE_LENGTH):
+        self._buffer = bytearray()
+        self._max_line_length = max_line_length
+        self._discarding = False
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buffer = self._buffer
+        # Only the unterminated tail of the previous read is rescanned
+        scan = len(buffer)
+        buffer += data
+        lines = []
+        start = 0
+        with memoryview(buffer) as view:
+            while True:
+                end = buffer.find(b'\n', scan)
+                if end == -1:
+                    break
+                scan = end + 1
+                if self._discarding:
+                    # Tail of a line that already blew the length cap
+                    self._discarding = False
+                    start = scan
+                    continue
+                line_end = end
+                if line_end > start and buffer[line_end - 1] == 0x0d:
+                    line_end -= 1
+                if 0 < line_end - start <= self._max_line_length:
+                    lines.append(bytes(view[start:line_end]))
+                start = scan
+        if start > 0:
+            del buffer[:start]
+        if len(buffer) > self._max_line_length:
+            buffer.clear()
+            self._discarding = True
+        return lines
+
+
 class IRCProtocolFactory(object):
-    def __init__(self, delegate: 'IRCProtocolDelegate'):
+    def __init__(self, delegate: 'IRCProtocolDelegate', flood_rate: Optional[float]=DEFAULT_RATE,
+                 flood_burst: int=DEFAULT_BURST):
         self._delegate = delegate
+        self._flood_rate = flood_rate
+        self._flood_burst = flood_burst
 
     def __call__(self) -> 'IRCProtocol':
-        return IRCProtocol(self._delegate)
+        return IRCProtocol(self._delegate, self._flood_rate, self._flood_burst)
 
 
 class IRCProtocol(Protocol):
-    def __init__(self, delegate: 'IRCProtocolDelegate'):
+    @property
+    def send_queue_depth(self) -> int:
+        if self._queue is None:
+            return 0
+        return self._queue.depth
+
+    def __init__(self, delegate: 'IRCProtocolDelegate', flood_rate: Optional[float]=DEFAULT_RATE,
+                 flood_burst: int=DEFAULT_BURST):
         self._transport = None
+        self._queue = None
+        self._nick = None
+        self._requested_nick = None
+        self._nick_retries = 0
+        self._registered = False
         self._delegate = delegate
+        self._flood_rate = flood_rate
+        self._flood_burst = flood_burst
+        self._buffer = _LineBuffer()
+        self._handlers = {command: [handler] for command, handler in self._HANDLERS.items()}
 
     def connection_made(self, transport: Transport):
         self._transport = transport
+        self._queue = SendQueue(asyncio.get_event_loop(), transport.write, self._flood_rate, self._flood_burst)
         self._schedule(self._delegate.proto_connected(self))
 
     def data_received(self, data: bytes) -> None:
-        for datum in data.rstrip(b'\r\n').split(b'\r\n'):
+        for line in self._buffer.feed(data):
             try:
-                message = Message(datum)
-                self._dispatch(message)
+                message = Message(line)
             except MessageError:
-                raise
+                # A single malformed line should not take down the connection
+                continue
+            self._dispatch(message)
 
     def connection_lost(self, error: Optional[Exception]):
+        if self._queue is not None:
+            self._queue.clear()
         self._schedule(self._delegate.proto_disconnected(self))
 
+    def pause_reading(self):
+        self._transport.pause_reading()
+
+    def resume_reading(self):
+        self._transport.resume_reading()
+
     def _schedule(self, coro_or_future: Union[CoroutineType, Future]):
         self._delegate.proto_ensure_future(self, coro_or_future)
 
-    def _send(self, command: Command, *args: List[str], long_arg: Optional[str]=None):
+    def _line(self, command: Command, *args: str, long_arg: Optional[str]=None) -> bytes:
+        message = command.value + ' ' + ' '.join(arg for arg in args if arg)
+        if long_arg is not None:
+            message += ' :' + long_arg
+        return message.encode() + b'\r\n'
+
+    def _send(self, command: Command, *args: List[str], long_arg: Optional[str]=None, priority: bool=False):
         message = command.value + ' ' + ' '.join(arg for arg in args if arg)
         encoded_message = message.encode()
-        if long_arg is None:
-            self._transport.write(encoded_message + b'\r\n')
+        if priority:
+            # Control replies are short, so the trailing argument goes out unchunked
+            self._queue.push_priority(self._line(command, *args, long_arg=long_arg))
+        elif long_arg is None:
+            self._queue.push(encoded_message + b'\r\n')
         else:
             # IRC limits messages to 512 bytes. So we need to chunk the message
             chunk_size = 508 - len(encoded_message)
             for chunk in _chunk_bytes(long_arg.encode(), chunk_size):
-                self._transport.write(encoded_message + b' :' + chunk + b'\r\n')
+                self._queue.push(encoded_message + b' :' + chunk + b'\r\n')
 
     def _dispatch(self, message: Message):
-        # Parse the command
-        command, reply, error = None, None, None
-        try:
-            command = Command(message.command)
-        except ValueError:
-            try:
-                reply = ReplyCode(message.command)
-            except ValueError:
-                try:
-                    error = ErrorCode(message.command)
-                except ValueError:
-                    pass
-                else:
-                    pass
-            else:
-                pass
+        min_args = self._MIN_ARGS.get(message.command)
+        if min_args is not None and message.arg_count < min_args:
+            # Handlers index their arguments, a truncated line is dropped rather than raising
+            return
+        for handler in self._handlers.get(message.command, ()):
+            handler(self, message)
+
+    def register(self, command: Union[Command, ReplyCode, ErrorCode, str], handler: _Handler):
+        def schedule(proto: IRCProtocol, message: Message):
+            proto._schedule(handler(proto, message))
+        self._handlers.setdefault(_command_key(command), []).append(schedule)
+
+    def observe(self, command: Union[Command, ReplyCode, ErrorCode, str],
+                callback: Callable[['IRCProtocol', Message], None]):
+        # Called inline while the line is parsed, so it sees messages strictly in order
+        self._handlers.setdefault(_command_key(command), []).append(callback)
+
+    def _on_kick(self, message: Message):
+        self._schedule(self._delegate.proto_kick(self, message.prefix,
+                                                 sys.intern(message.args[0]),
+                                                 sys.intern(message.args[1]),
+                                                 _get_default(message.args, 2)))
+
+    def _on_join(self, message: Message):
+        self._schedule(self._delegate.proto_join(self, message.prefix,
+                                                 sys.intern(message.args[0])))
+
+    def _on_part(self, message: Message):
+        self._schedule(self._delegate.proto_part(self, message.prefix,
+                                                 sys.intern(message.args[0]),
+                                                 _get_default(message.args, 1)))
+
+    def _on_ping(self, message: Message):
+        # Answered inline so keepalives never wait behind plugin tasks or queued lines
+        self._send(Command.PONG, message.args[0], priority=True)
+
+    def _on_error(self, message: Message):
+        # The server is about to close the link, anything still queued is moot
+        self._queue.clear()
+        self._transport.close()
+
+    def _on_welcome(self, message: Message):
+        self._registered = True
+        self._nick = message.args[0]
+        self._schedule(self._delegate.proto_registered(self, self._nick))
+
+    def _on_nick_unavailable(self, message: Message):
+        # Only retry while registering, afterwards the server keeps our old nick
+        if self._registered:
+            return
+        nick = _get_default(message.args, 1, self._nick)
+        self._nick_retries += 1
+        if self._nick_retries > MAX_NICK_RETRIES or len(nick) < 2:
+            # Every variation was refused, reconnecting beats hanging until the server times us out
+            self._transport.close()
+            return
+        if message.command == '%03d' % ErrorCode.ERRONEUSNICKNAME:
+            # Usually over NICKLEN after a few underscores, so go back to the requested nick's length
+            # and swap its last character for a digit
+            requested = self._requested_nick or nick
+            base = requested if len(nick) > len(requested) else nick
+            self._nick = base[:-1] + str(self._nick_retries % 10)
         else:
-            if command == Command.KICK:
-                self._schedule(self._delegate.proto_kick(self, message.prefix,
-                                                         message.args[0],
-                                                         message.args[1],
-                                                         _get_default(message.args, 2)))
-            elif command == Command.JOIN:
-                self._schedule(self._delegate.proto_join(self, message.prefix,
-                                                         message.args[0]))
-            elif command == Command.PART:
-                self._schedule(self._delegate.proto_part(self, message.prefix,
-                                                         message.args[0],
-                                                         _get_default(message.args, 1)))
-            elif command == Command.PING:
-                self._schedule(self._delegate.proto_ping(self, message.args[0]))
-            elif command == Command.PRIVMSG:
-                self._schedule(self._delegate.proto_privmsg(self, message.prefix,
-                                                            message.args[0],
-                                                            message.args[1]))
-            elif command == Command.TOPIC:
-                self._schedule(self._delegate.proto_topic(self, message.prefix,
-                                                          message.args[0],
-                                                          _get_default(message.args, 1)))
+            self._nick = nick + '_'
+        self._send(Command.NICK, self._nick, priority=True)
+
+    def _on_privmsg(self, message: Message):
+        # Targets are a handful of channels, interned so plugin dict lookups compare by identity
+        self._schedule(self._delegate.proto_privmsg(self, message.prefix,
+                                                    sys.intern(message.args[0]),
+                                                    message.args[1]))
+
+    def _on_topic(self, message: Message):
+        self._schedule(self._delegate.proto_topic(self, message.prefix,
+                                                  sys.intern(message.args[0]),
+                                                  _get_default(message.args, 1)))
+
+    _HANDLERS = {
+        Command.KICK.value: _on_kick,
+        Command.JOIN.value: _on_join,
+        Command.PART.value: _on_part,
+        Command.PING.value: _on_ping,
+        Command.ERROR.value: _on_error,
+        '%03d' % ReplyCode.WELCOME: _on_welcome,
+        '%03d' % ErrorCode.NICKNAMEINUSE: _on_nick_unavailable,
+        '%03d' % ErrorCode.NICKCOLLISION: _on_nick_unavailable,
+        '%03d' % ErrorCode.UNAVAILRESOURCE: _on_nick_unavailable,
+        '%03d' % ErrorCode.ERRONEUSNICKNAME: _on_nick_unavailable,
+        Command.PRIVMSG.value: _on_privmsg,
+        Command.TOPIC.value: _on_topic
+    }
+
+    _MIN_ARGS = {
+        Command.KICK.value: 2,
+        Command.JOIN.value: 1,
+        Command.PART.value: 1,
+        Command.PING.value: 1,
+        Command.NICK.value: 1,
+        '%03d' % ReplyCode.WELCOME: 1,
+        Command.PRIVMSG.value: 2,
+        Command.TOPIC.value: 1
+    }
 
     def cmd_kick(self, channel: str, nick: str, message: Optional[str]=None):
         self._send(Command.KICK, channel, nick, long_arg=message)
 
     def cmd_join(self, channels: List[str], passwords: Optional[List[str]]=None):
-        password_string = None
-        if passwords is not None:
-            password_string = ','.join(passwords)
-        self._send(Command.JOIN, ','.join(channels), password_string)
+        for line in _pack_join(channels, passwords):
+            self._queue.push(line)
 
     def cmd_nick(self, nick: str):
+        if not self._registered:
+            self._nick = nick
+            self._requested_nick = nick
         self._send(Command.NICK, nick)
 
     def cmd_part(self, channels: List[str], message: Optional[str]=None):
@@ -143,6 +338,18 @@ class IRCProtocol(Protocol):
     def cmd_user(self, username: str, hostname: str, servername: str, realname: str):
         self._send(Command.USER, username, hostname, servername, long_arg=realname)
 
+    def cmd_register(self, nick: str, username: str, realname: str, password: Optional[str]=None):
+        # PASS, NICK and USER leave in a single write instead of a round of flood-controlled ones
+        lines = []
+        if password is not None:
+            lines.append(self._line(Command.PASS, password))
+        self._nick = nick
+        self._requested_nick = nick
+        self._nick_retries = 0
+        lines.append(self._line(Command.NICK, nick))
+        lines.append(self._line(Command.USER, username, 'localhost', 'localhost', long_arg=realname))
+        self._queue.push_priority(*lines)
+
 
 class IRCProtocolDelegate(ABC):
     def proto_ensure_future(self, proto: IRCProtocol, coro_or_future: Union[CoroutineType, Future]):
@@ -163,7 +370,7 @@ class IRCProtocolDelegate(ABC):
     async def proto_part(self, proto: IRCProtocol, prefix: Prefix, channel: str, message: Optional[str]=None):
         raise NotImplementedError
 
-    async def proto_ping(self, proto: IRCProtocol, server: str):
+    async def proto_registered(self, proto: IRCProtocol, nick: str):
         raise NotImplementedError
 
     async def proto_privmsg(self, proto: IRCProtocol, prefix: Prefix, target: str, message: str):
@@ -10,24 +10,217 @@ __all__ = [
 
 @unique
 class Command(Enum):
+    ADMIN = 'ADMIN'
+    AWAY = 'AWAY'
+    CONNECT = 'CONNECT'
+    DIE = 'DIE'
+    ERROR = 'ERROR'
+    INFO = 'INFO'
+    INVITE = 'INVITE'
+    ISON = 'ISON'
     JOIN = 'JOIN'
     KICK = 'KICK'
+    KILL = 'KILL'
+    LINKS = 'LINKS'
+    LIST = 'LIST'
+    LUSERS = 'LUSERS'
+    MODE = 'MODE'
+    MOTD = 'MOTD'
+    NAMES = 'NAMES'
     NICK = 'NICK'
     NOTICE = 'NOTICE'
+    OPER = 'OPER'
     PART = 'PART'
     PASS = 'PASS'
     PING = 'PING'
     PONG = 'PONG'
     PRIVMSG = 'PRIVMSG'
+    QUIT = 'QUIT'
+    REHASH = 'REHASH'
+    RESTART = 'RESTART'
+    SERVICE = 'SERVICE'
+    SERVLIST = 'SERVLIST'
+    SQUERY = 'SQUERY'
+    SQUIT = 'SQUIT'
+    STATS = 'STATS'
+    SUMMON = 'SUMMON'
+    TIME = 'TIME'
     TOPIC = 'TOPIC'
+    TRACE = 'TRACE'
     USER = 'USER'
+    USERHOST = 'USERHOST'
+    USERS = 'USERS'
+    VERSION = 'VERSION'
+    WALLOPS = 'WALLOPS'
+    WHO = 'WHO'
+    WHOIS = 'WHOIS'
+    WHOWAS = 'WHOWAS'
 
 
 @unique
 class ReplyCode(IntEnum):
-    pass
+    WELCOME = 1
+    YOURHOST = 2
+    CREATED = 3
+    MYINFO = 4
+    BOUNCE = 5
+    TRACELINK = 200
+    TRACECONNECTING = 201
+    TRACEHANDSHAKE = 202
+    TRACEUNKNOWN = 203
+    TRACEOPERATOR = 204
+    TRACEUSER = 205
+    TRACESERVER = 206
+    TRACESERVICE = 207
+    TRACENEWTYPE = 208
+    TRACECLASS = 209
+    TRACERECONNECT = 210
+    STATSLINKINFO = 211
+    STATSCOMMANDS = 212
+    STATSCLINE = 213
+    STATSNLINE = 214
+    STATSILINE = 215
+    STATSKLINE = 216
+    STATSQLINE = 217
+    STATSYLINE = 218
+    ENDOFSTATS = 219
+    UMODEIS = 221
+    SERVICEINFO = 231
+    ENDOFSERVICES = 232
+    SERVICE = 233
+    SERVLIST = 234
+    SERVLISTEND = 235
+    STATSVLINE = 240
+    STATSLLINE = 241
+    STATSUPTIME = 242
+    STATSOLINE = 243
+    STATSHLINE = 244
+    STATSSLINE = 245
+    STATSPING = 246
+    STATSBLINE = 247
+    STATSDLINE = 250
+    LUSERCLIENT = 251
+    LUSEROP = 252
+    LUSERUNKNOWN = 253
+    LUSERCHANNELS = 254
+    LUSERME = 255
+    ADMINME = 256
+    ADMINLOC1 = 257
+    ADMINLOC2 = 258
+    ADMINEMAIL = 259
+    TRACELOG = 261
+    TRACEEND = 262
+    TRYAGAIN = 263
+    NONE = 300
+    AWAY = 301
+    USERHOST = 302
+    ISON = 303
+    UNAWAY = 305
+    NOWAWAY = 306
+    WHOISUSER = 311
+    WHOISSERVER = 312
+    WHOISOPERATOR = 313
+    WHOWASUSER = 314
+    ENDOFWHO = 315
+    WHOISCHANOP = 316
+    WHOISIDLE = 317
+    ENDOFWHOIS = 318
+    WHOISCHANNELS = 319
+    LISTSTART = 321
+    LIST = 322
+    LISTEND = 323
+    CHANNELMODEIS = 324
+    UNIQOPIS = 325
+    NOTOPIC = 331
+    TOPIC = 332
+    INVITING = 341
+    SUMMONING = 342
+    INVITELIST = 346
+    ENDOFINVITELIST = 347
+    EXCEPTLIST = 348
+    ENDOFEXCEPTLIST = 349
+    VERSION = 351
+    WHOREPLY = 352
+    NAMREPLY = 353
+    KILLDONE = 361
+    CLOSING = 362
+    CLOSEEND = 363
+    LINKS = 364
+    ENDOFLINKS = 365
+    ENDOFNAMES = 366
+    BANLIST = 367
+    ENDOFBANLIST = 368
+    ENDOFWHOWAS = 369
+    INFO = 371
+    MOTD = 372
+    INFOSTART = 373
+    ENDOFINFO = 374
+    MOTDSTART = 375
+    ENDOFMOTD = 376
+    YOUREOPER = 381
+    REHASHING = 382
+    YOURESERVICE = 383
+    MYPORTIS = 384
+    TIME = 391
+    USERSSTART = 392
+    USERS = 393
+    ENDOFUSERS = 394
+    NOUSERS = 395
 
 
 @unique
 class ErrorCode(IntEnum):
-    pass
\ No newline at end of file
+    NOSUCHNICK = 401
+    NOSUCHSERVER = 402
+    NOSUCHCHANNEL = 403
+    CANNOTSENDTOCHAN = 404
+    TOOMANYCHANNELS = 405
+    WASNOSUCHNICK = 406
+    TOOMANYTARGETS = 407
+    NOSUCHSERVICE = 408
+    NOORIGIN = 409
+    NORECIPIENT = 411
+    NOTEXTTOSEND = 412
+    NOTOPLEVEL = 413
+    WILDTOPLEVEL = 414
+    BADMASK = 415
+    UNKNOWNCOMMAND = 421
+    NOMOTD = 422
+    NOADMININFO = 423
+    FILEERROR = 424
+    NONICKNAMEGIVEN = 431
+    ERRONEUSNICKNAME = 432
+    NICKNAMEINUSE = 433
+    NICKCOLLISION = 436
+    UNAVAILRESOURCE = 437
+    USERNOTINCHANNEL = 441
+    NOTONCHANNEL = 442
+    USERONCHANNEL = 443
+    NOLOGIN = 444
+    SUMMONDISABLED = 445
+    USERSDISABLED = 446
+    NOTREGISTERED = 451
+    NEEDMOREPARAMS = 461
+    ALREADYREGISTRED = 462
+    NOPERMFORHOST = 463
+    PASSWDMISMATCH = 464
+    YOUREBANNEDCREEP = 465
+    YOUWILLBEBANNED = 466
+    KEYSET = 467
+    CHANNELISFULL = 471
+    UNKNOWNMODE = 472
+    INVITEONLYCHAN = 473
+    BANNEDFROMCHAN = 474
+    BADCHANNELKEY = 475
+    BADCHANMASK = 476
+    NOCHANMODES = 477
+    BANLISTFULL = 478
+    NOPRIVILEGES = 481
+    CHANOPRIVSNEEDED = 482
+    CANTKILLSERVER = 483
+    RESTRICTED = 484
+    UNIQOPPRIVSNEEDED = 485
+    NOOPERHOST = 491
+    NOSERVICEHOST = 492
+    UMODEUNKNOWNFLAG = 501
+    USERSDONTMATCH = 502
@@ -0,0 +1,83 @@
+from asyncio import AbstractEventLoop
+from typing import Callable, Optional
+from collections import deque
+
+
+__all__ = [
+    'SendQueue'
+]
+
+
+# RFC 1459 flood control: one line every two seconds, up to ten seconds ahead
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 5
+
+
+class SendQueue(object):
+    @property
+    def depth(self) -> int:
+        return len(self._lines)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        return self._burst
+
+    def __init__(self, loop: AbstractEventLoop, write: Callable[[bytes], None],
+                 rate: Optional[float]=DEFAULT_RATE, burst: int=DEFAULT_BURST):
+        self._loop = loop
+        self._write = write
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._last = loop.time()
+        self._lines = deque()
+        self._handle = None
+
+    def push(self, line: bytes):
+        self._lines.append(line)
+        self._schedule()
+
+    def push_priority(self, *lines: bytes):
+        # Server-control replies skip the queue but still count against the bucket
+        if self._rate is not None and self._rate > 0:
+            self._refill()
+            self._tokens -= len(lines)
+        self._write(b''.join(lines))
+
+    def clear(self):
+        self._lines.clear()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        # Lines pushed in the same loop iteration are coalesced into one write
+        if self._handle is None:
+            self._handle = self._loop.call_soon(self._drain)
+
+    def _refill(self):
+        now = self._loop.time()
+        self._tokens = min(float(self._burst), self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+    def _drain(self):
+        self._handle = None
+        lines = self._lines
+        if not lines:
+            return
+        if self._rate is None or self._rate <= 0:
+            count = len(lines)
+        else:
+            self._refill()
+            # Priority writes may have left the bucket in debt, which has to be paid off first
+            count = max(0, min(int(self._tokens), len(lines)))
+            self._tokens -= count
+        if count > 0:
+            self._write(b''.join([lines.popleft() for _ in range(count)]))
+        if lines:
+            delay = (1.0 - self._tokens) / self._rate
+            self._handle = self._loop.call_later(delay, self._drain)
@@ -0,0 +1,258 @@
+from typing import Dict, Iterable, List, Optional
+import sys
+
+from .message import Message, Prefix
+from .rfc import Command, ReplyCode
+
+
+__all__ = [
+    'fold',
+    'User',
+    'Channel',
+    'StateTracker'
+]
+
+
+# RFC 2812 casemapping, {}|^ are the lower case forms of []\~
+_CASEMAP = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ[]\\~', 'abcdefghijklmnopqrstuvwxyz{}|^')
+# Channel membership prefixes as sent in NAMES replies, highest first
+_MEMBER_PREFIXES = '~&@%+'
+_NO_MODES = ''
+# Commands that are only meaningful with the acting user's nick in the prefix
+_FROM_USER = frozenset((Command.JOIN.value, Command.PART.value, Command.QUIT.value, Command.NICK.value))
+
+
+def fold(name: str) -> str:
+    return sys.intern(name.translate(_CASEMAP))
+
+
+class User(object):
+    # Shared by every channel the user is in, counting them instead of holding a set keeps records small
+    __slots__ = ('_nick', '_username', '_host', '_refs')
+
+    @property
+    def nick(self) -> str:
+        return self._nick
+
+    @property
+    def username(self) -> Optional[str]:
+        return self._username
+
+    @property
+    def host(self) -> Optional[str]:
+        return self._host
+
+    def __init__(self, nick: str):
+        self._nick = sys.intern(nick)
+        self._username = None
+        self._host = None
+        self._refs = 0
+
+    def __repr__(self) -> str:
+        return 'User(%r)' % self._nick
+
+
+class Channel(object):
+    __slots__ = ('_name', '_members')
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def members(self) -> Dict[User, str]:
+        # Maps each user to their membership prefixes, such as '@' or ''
+        return self._members
+
+    def __init__(self, name: str):
+        self._name = sys.intern(name)
+        self._members = {}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __repr__(self) -> str:
+        return 'Channel(%r)' % self._name
+
+
+class StateTracker(object):
+    COMMANDS = (
+        Command.JOIN,
+        Command.PART,
+        Command.KICK,
+        Command.QUIT,
+        Command.NICK,
+        ReplyCode.NAMREPLY,
+        ReplyCode.ENDOFNAMES
+    )
+
+    @property
+    def channels(self) -> Iterable[Channel]:
+        return self._channels.values()
+
+    def __init__(self):
+        self._users = {}
+        self._channels = {}
+        self._names = {}
+
+    def channel(self, name: str) -> Optional[Channel]:
+        return self._channels.get(fold(name))
+
+    def user(self, nick: str) -> Optional[User]:
+        return self._users.get(fold(nick))
+
+    def is_on(self, nick: str, channel: str) -> bool:
+        return self.modes(nick, channel) is not None
+
+    def modes(self, nick: str, channel: str) -> Optional[str]:
+        user = self._users.get(fold(nick))
+        tracked = self._channels.get(fold(channel))
+        if user is None or tracked is None:
+            return None
+        return tracked.members.get(user)
+
+    def clear(self):
+        self._users.clear()
+        self._channels.clear()
+        self._names.clear()
+
+    def handle(self, message: Message, nick: str):
+        handler = self._HANDLERS.get(message.command)
+        if handler is None or not message.args:
+            return
+        if message.command in _FROM_USER and (message.prefix is None or not message.prefix.nick):
+            return
+        handler(self, message, fold(nick))
+
+    def replay(self, nick: str) -> List[str]:
+        # Lines that rebuild this state in an empty tracker
+        lines = []
+        for channel in self._channels.values():
+            lines.append(':%s!lobot@lobot JOIN %s' % (nick, channel.name))
+            head = ':lobot 353 %s = %s :' % (nick, channel.name)
+            names = []
+            size = len(head)
+            for user, modes in channel.members.items():
+                name = modes + user.nick
+                if names and size + len(name) + 1 > 510:
+                    lines.append(head + ' '.join(names))
+                    names = []
+                    size = len(head)
+                names.append(name)
+                size += len(name) + 1
+            if names:
+                lines.append(head + ' '.join(names))
+            lines.append(':lobot 366 %s %s :End of NAMES list' % (nick, channel.name))
+        return lines
+
+    def _get_user(self, nick: str, prefix: Optional[Prefix]=None) -> User:
+        key = fold(nick)
+        user = self._users.get(key)
+        if user is None:
+            user = self._users[key] = User(nick)
+        if prefix is not None and prefix.host is not None:
+            user._username = prefix.username
+            user._host = prefix.host
+        return user
+
+    def _add_member(self, channel: Channel, user: User, modes: str):
+        if user not in channel._members:
+            user._refs += 1
+        channel._members[user] = modes
+
+    def _remove_member(self, channel: Channel, user: User):
+        if channel._members.pop(user, None) is not None:
+            self._release(user)
+
+    def _release(self, user: User):
+        user._refs -= 1
+        if user._refs <= 0:
+            # Users who share no channel with us are forgotten
+            self._users.pop(fold(user.nick), None)
+
+    def _drop_channel(self, key: str):
+        channel = self._channels.pop(key, None)
+        self._names.pop(key, None)
+        if channel is not None:
+            for user in channel._members:
+                self._release(user)
+
+    def _on_join(self, message: Message, me: str):
+        nick = message.prefix.nick
+        for name in message.args[0].split(','):
+            key = fold(name)
+            if fold(nick) == me and key not in self._channels:
+                self._channels[key] = Channel(name)
+            channel = self._channels.get(key)
+            if channel is not None:
+                self._add_member(channel, self._get_user(nick, message.prefix), _NO_MODES)
+
+    def _on_part(self, message: Message, me: str):
+        self._leave(message.args[0].split(','), message.prefix.nick, me)
+
+    def _on_kick(self, message: Message, me: str):
+        if len(message.args) > 1:
+            self._leave(message.args[0].split(','), message.args[1], me)
+
+    def _leave(self, names: List[str], nick: str, me: str):
+        key = fold(nick)
+        for name in names:
+            if key == me:
+                self._drop_channel(fold(name))
+                continue
+            channel = self._channels.get(fold(name))
+            user = self._users.get(key)
+            if channel is not None and user is not None:
+                self._remove_member(channel, user)
+
+    def _on_quit(self, message: Message, me: str):
+        user = self._users.pop(fold(message.prefix.nick), None)
+        if user is not None:
+            for channel in self._channels.values():
+                channel._members.pop(user, None)
+
+    def _on_nick(self, message: Message, me: str):
+        user = self._users.pop(fold(message.prefix.nick), None)
+        if user is not None:
+            user._nick = sys.intern(message.args[0])
+            self._users[fold(user._nick)] = user
+
+    def _on_names(self, message: Message, me: str):
+        if len(message.args) < 3:
+            return
+        key = fold(message.args[-2])
+        if key not in self._channels:
+            return
+        # Replies accumulate until 366 so a refresh never shows a half-filled channel
+        pending = self._names.setdefault(key, {})
+        for name in message.args[-1].split():
+            stripped = name.lstrip(_MEMBER_PREFIXES)
+            modes = sys.intern(name[:len(name) - len(stripped)])
+            nick, _, _ = stripped.partition('!')
+            if nick:
+                pending[nick] = modes
+
+    def _on_end_of_names(self, message: Message, me: str):
+        if len(message.args) < 2:
+            return
+        key = fold(message.args[1])
+        pending = self._names.pop(key, None)
+        channel = self._channels.get(key)
+        if pending is None or channel is None:
+            return
+        old = channel._members
+        channel._members = {}
+        for nick, modes in pending.items():
+            self._add_member(channel, self._get_user(nick), modes)
+        for user in old:
+            self._release(user)
+
+    _HANDLERS = {
+        Command.JOIN.value: _on_join,
+        Command.PART.value: _on_part,
+        Command.KICK.value: _on_kick,
+        Command.QUIT.value: _on_quit,
+        Command.NICK.value: _on_nick,
+        '%03d' % ReplyCode.NAMREPLY: _on_names,
+        '%03d' % ReplyCode.ENDOFNAMES: _on_end_of_names
+    }
@@ -1,18 +1,14 @@
 from asyncio import AbstractEventLoop
-from collections import OrderedDict
-from typing import Optional, Union
-from types import CoroutineType
-from asyncio import Future
+from typing import Optional, List
 import asyncio
-import json
-import sys
-import re
+import signal
 import os
 
-from .irc.protocol import IRCProtocol, IRCProtocolFactory, IRCProtocolDelegate
-from .plugins.plugin import Plugin, _Bridge
-from .plugin_manager import PluginManager
-from .irc.message import Prefix
+from .dispatcher import Dispatcher
+from .network import Connection, network_configs
+from .workers import WorkerPool
+from .watcher import FileWatcher, DEFAULT_INTERVAL
+from .irc.message import Message
 
 
 __all__ = [
@@ -20,124 +16,137 @@ __all__ = [
 ]
 
 
-class Lobot(IRCProtocolDelegate, _Bridge):
+class Lobot(Dispatcher):
     @property
-    def proto(self) -> IRCProtocol:
-        return self._proto
-
-    @property
-    def config(self) -> dict:
-        return self._config
-
-    @property
-    def nick(self) -> str:
-        return self._nick
-
-    @property
-    def loop(self) -> str:
-        return self._loop
+    def workers(self) -> Optional[WorkerPool]:
+        return self._workers
 
     def __init__(self, loop: Optional[AbstractEventLoop], working_dir: str):
-        self._proto = None
-        self._loop = loop
-        self._working_dir = working_dir
-        self._plugin_manager = PluginManager()
-        self._reload_config()
-        self._connect()
-
-    def _ensure_future(self, coro_or_future: Union[CoroutineType, Future]):
-        asyncio.ensure_future(coro_or_future, loop=self._loop)
-
-    def _reload_config(self):
-        with open(os.path.join(self._working_dir, 'config.json')) as config:
-            self._config = json.load(config, object_pairs_hook=OrderedDict)
-        self._nick = self._config['lobot']['nick']
-        self._nick_pattern = re.compile('^@?' + self._nick + ':?', flags=re.IGNORECASE)
-
-    def _reload_plugins(self):
-        plugs_path = os.path.join(self._working_dir, self._config['lobot']['plugdir'])
-        sys.path.append(plugs_path)
-        for module in self._config['lobot']['plugins']:
-            for plugin in self._plugin_manager.load_module(module):
-                plugin._attach(module, self)
-                self._ensure_future(plugin.on_load())
-
-    def _connect(self):
-        factory = IRCProtocolFactory(self)
-        future = self._loop.create_connection(factory,
-                                              host=self._config['lobot']['host'],
-                                              port=self._config['lobot']['port'],
-                                              ssl=self._config['lobot']['ssl'])
-        self._ensure_future(future)
-
-    def _process_listeners(self, plugin: Plugin, prefix: Prefix, target: str, message: str):
-        # Process plugins using the @listen decorator
-        for listener in self._plugin_manager.find_attributes(plugin, '_listener_patterns'):
-            for pattern in getattr(listener, '_listener_patterns'):
-                match = pattern.search(message)
-                if match:
-                    self._ensure_future(listener(plugin, prefix.nick, target, message, match))
-                    break
-
-    def _process_commanders(self, plugin: Plugin, prefix: Prefix, target: str, message: str):
-        # Check for private messages or messages that start with our nick
-        message, count = self._nick_pattern.subn('', message)
-        if count == 0 and self._nick != target:
+        self._workers = None
+        self._plugins_loading = None
+        self._config_watcher = None
+        super().__init__(loop, working_dir)
+        # All networks share one set of plugins, caches and task limits
+        for name, config in network_configs(self._config).items():
+            self._networks[name] = Connection(self, name, config)
+        for connection in self._networks.values():
+            connection.connect()
+        self._watch_config()
+
+    def _watch_config(self):
+        try:
+            self._loop.add_signal_handler(signal.SIGHUP, self._apply_config)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # No SIGHUP on this platform, or the loop is not running in the main thread
+            pass
+        if self._config['lobot'].get('watch_config', False):
+            path = os.path.join(self._working_dir, 'config.json')
+            self._config_watcher = FileWatcher(self._loop, {path: 'config.json'},
+                                               lambda changed: self._apply_config(),
+                                               self._config['lobot'].get('watch_interval', DEFAULT_INTERVAL))
+            self._config_watcher.start()
+
+    def _apply_config(self):
+        old = self._config
+        try:
+            self._reload_config()
+            configs = network_configs(self._config)
+            modules = self._config['lobot']['plugins']
+        except (OSError, ValueError, KeyError) as e:
+            # A broken or half-written file leaves the running config in place
+            self._config = old
+            self._loop.call_exception_handler({
+                'message': 'Failed to reload config.json',
+                'exception': e
+            })
+            return
+        # Only what differs is applied, the connections themselves stay up
+        for name, connection in self._networks.items():
+            if name in configs:
+                connection.update_config(configs[name])
+        if self._plugins_loading is None or not self._plugins_loading.done():
+            return
+        old_modules = old['lobot']['plugins']
+        changed = self._changed_modules(old, [module for module in modules if module in old_modules])
+        if self._workers is not None:
+            # The pool spreads added modules over its workers and unloads removed ones
+            self._workers.reload(modules, changed)
             return
-        message = message.lstrip()
-        # Send on_command message
-        self._ensure_future(plugin.on_command(prefix.nick, target, message))
-        # Process plugins using the @command decorator
-        for commander in self._plugin_manager.find_attributes(plugin, '_commander_patterns'):
-            for pattern in getattr(commander, '_commander_patterns'):
-                match = pattern.search(message)
-                if match:
-                    self._ensure_future(commander(plugin, prefix.nick, target, message, match))
-                    break
-
-    def proto_ensure_future(self, proto: IRCProtocol, coro_or_future: Union[CoroutineType, Future]):
-        self._ensure_future(coro_or_future)
-
-    async def proto_connected(self, proto: IRCProtocol):
-        self._proto = proto
-        proto.cmd_nick(self._nick)
-        proto.cmd_user(self._config['lobot']['username'], 'localhost', 'localhost', self._nick)
-        proto.cmd_join(self._config['lobot']['channels'])
-        self._reload_plugins()
-        for plugin in self._plugin_manager.plugins:
-            self._ensure_future(plugin.on_connected())
-
-    async def proto_disconnected(self, proto: IRCProtocol):
-        self._proto = None
-        for plugin in self._plugin_manager.plugins:
-            self._ensure_future(plugin.on_disconnected())
-
-    async def proto_kick(self, proto: IRCProtocol, prefix: Prefix, channel: str, nick: str, message: Optional[str]=None):
-        pass
-
-    async def proto_join(self, proto: IRCProtocol, prefix: Prefix, channel: str):
-        for plugin in self._plugin_manager.plugins:
-            if prefix.nick == self._nick:
-                self._ensure_future(plugin.on_join(channel))
-            else:
-                self._ensure_future(plugin.on_they_join(prefix.nick, channel))
-
-    async def proto_part(self, proto: IRCProtocol, prefix: Prefix, channel: str, message: Optional[str]=None):
-        pass
-
-    async def proto_ping(self, proto: IRCProtocol, server: str):
-        proto.cmd_pong(server)
-
-    async def proto_privmsg(self, proto: IRCProtocol, prefix: Prefix, target: str, message: str):
-        if prefix.nick == self._nick:
+        self._unload_modules([module for module in old_modules if module not in modules])
+        self._reload_modules([module for module in modules if module not in old_modules] + changed)
+        if self._watcher is not None:
+            self._watch_plugins()
+
+    def _pause_reading(self):
+        # Stop reading from the servers until plugins work through their backlog
+        for connection in self._networks.values():
+            if connection.proto is not None:
+                connection.proto.pause_reading()
+
+    def _resume_reading(self):
+        for connection in self._networks.values():
+            if connection.proto is not None:
+                connection.proto.resume_reading()
+
+    async def _reload_plugins(self):
+        modules = self._config['lobot']['plugins']
+        count = self._config['lobot'].get('workers', 0)
+        if count <= 0 or not modules:
+            await self._load_plugins(modules)
+        elif self._workers is None:
+            # Worker processes restart themselves, so they are only started once
+            self._workers = WorkerPool(self._loop, self._working_dir, modules, count, self._networks,
+                                       self._on_worker_call)
+            self._workers.start()
+
+    def _on_worker_call(self, network: str, name: str, args: List[Optional[str]]):
+        connection = self._networks.get(network)
+        proto = connection.proto if connection is not None else None
+        if proto is None:
             return
-        for plugin in self._plugin_manager.plugins:
-            self._process_listeners(plugin, prefix, target, message)
-            self._process_commanders(plugin, prefix, target, message)
-            if target == self._nick:
-                self._ensure_future(plugin.on_private_msg(prefix.nick, message))
-            else:
-                self._ensure_future(plugin.on_msg(prefix.nick, target, message))
-
-    async def proto_topic(self, proto: IRCProtocol, prefix: Prefix, channel: str, message: Optional[str]=None):
-        pass
+        if name == 'join':
+            proto.cmd_join(args[0].split(','), args[1].split(',') if args[1] is not None else None)
+        elif name == 'part':
+            proto.cmd_part(args[0].split(','), args[1])
+        else:
+            getattr(proto, 'cmd_' + name)(*args)
+
+    async def _network_connected(self, connection: Connection):
+        # Plugins keep their state across reconnects, they are only loaded the first time
+        if self._plugins_loading is None:
+            self._plugins_loading = asyncio.ensure_future(self._reload_plugins())
+        if not self._plugins_loading.done():
+            # Lines read before the plugins are in place would go unanswered
+            proto = connection.proto
+            proto.pause_reading()
+            try:
+                await asyncio.shield(self._plugins_loading)
+            finally:
+                if connection.proto is proto:
+                    proto.resume_reading()
+        self._dispatch_connected(connection)
+        if self._workers is not None:
+            self._workers.connected(connection.name)
+
+    def _network_disconnected(self, connection: Connection):
+        self._dispatch_disconnected(connection)
+        if self._workers is not None:
+            self._workers.disconnected(connection.name)
+
+    def _network_nick(self, connection: Connection):
+        if self._workers is not None:
+            self._workers.nick(connection.name, connection.nick)
+
+    def _network_state(self, connection: Connection, message: Message):
+        if self._workers is not None:
+            self._workers.state(connection.name, message)
+
+    def _network_join(self, connection: Connection, nick: str, channel: str):
+        self._dispatch_join(connection, nick, channel)
+        if self._workers is not None:
+            self._workers.join(connection.name, nick, channel)
+
+    def _network_privmsg(self, connection: Connection, nick: str, target: str, message: str):
+        self._dispatch_privmsg(connection, nick, target, message)
+        if self._workers is not None and nick != connection.nick:
+            self._workers.privmsg(connection.name, nick, target, message)
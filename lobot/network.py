@@ -0,0 +1,199 @@
+from typing import Optional, Union, List, Tuple
+from collections import OrderedDict
+from types import CoroutineType
+from asyncio import Future
+import asyncio
+import random
+import re
+
+from .irc.protocol import IRCProtocol, IRCProtocolFactory, IRCProtocolDelegate
+from .irc.send_queue import DEFAULT_RATE, DEFAULT_BURST
+from .irc.message import Message, Prefix
+from .irc.state import StateTracker, fold
+
+
+__all__ = [
+    'DEFAULT_NETWORK',
+    'network_configs',
+    'Network',
+    'Connection'
+]
+
+
+DEFAULT_NETWORK = 'default'
+DEFAULT_RECONNECT_DELAY = 1.0
+DEFAULT_RECONNECT_MAX_DELAY = 300.0
+
+
+def network_configs(config: dict) -> 'OrderedDict[str, dict]':
+    # Each entry of "networks" overrides the shared lobot section for one connection
+    base = config['lobot']
+    networks = base.get('networks')
+    if not networks:
+        return OrderedDict([(DEFAULT_NETWORK, base)])
+    configs = OrderedDict()
+    for name, overrides in networks.items():
+        merged = OrderedDict(base)
+        merged.update(overrides)
+        configs[name] = merged
+    return configs
+
+
+def _compile_nick_pattern(nick: str):
+    return re.compile('^@?' + re.escape(nick) + ':?', flags=re.IGNORECASE)
+
+
+class Network(object):
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def nick(self) -> str:
+        return self._nick
+
+    @property
+    def nick_pattern(self):
+        return self._nick_pattern
+
+    @property
+    def proto(self) -> Optional[IRCProtocol]:
+        return self._proto
+
+    @property
+    def state(self) -> StateTracker:
+        return self._state
+
+    def __init__(self, name: str, nick: str, proto: Optional[IRCProtocol]=None):
+        self._name = name
+        self._proto = proto
+        self._state = StateTracker()
+        self.set_nick(nick)
+
+    def set_nick(self, nick: str):
+        self._nick = nick
+        self._nick_pattern = _compile_nick_pattern(nick)
+
+
+class Connection(Network, IRCProtocolDelegate):
+    @property
+    def config(self) -> dict:
+        return self._config
+
+    def __init__(self, bot: 'Lobot', name: str, config: dict):
+        super().__init__(name, config['nick'])
+        self._bot = bot
+        self._config = config
+        self._attempts = 0
+
+    def _servers(self) -> List[Tuple[str, int, bool]]:
+        servers = self._config.get('servers')
+        if not servers:
+            return [(self._config['host'], self._config['port'], self._config['ssl'])]
+        return [(server['host'], server['port'], server.get('ssl', False)) for server in servers]
+
+    async def _open_connection(self):
+        factory = IRCProtocolFactory(self,
+                                     flood_rate=self._config.get('flood_rate', DEFAULT_RATE),
+                                     flood_burst=self._config.get('flood_burst', DEFAULT_BURST))
+        error = None
+        # Servers are tried in order, each one racing all of its resolved addresses
+        for host, port, ssl in self._servers():
+            try:
+                sock = await self._bot.resolver.open_socket(host, port)
+                await self._bot.loop.create_connection(factory, sock=sock, ssl=ssl,
+                                                       server_hostname=host if ssl else None)
+                return
+            except OSError as e:
+                error = e
+        raise error
+
+    def connect(self, delay: float=0.0):
+        self._bot._ensure_future(self._connect_after(delay))
+
+    async def _connect_after(self, delay: float):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await self._open_connection()
+        except OSError:
+            self.connect(self._backoff())
+
+    def _backoff(self) -> float:
+        # Exponential with jitter so a netsplit does not make every bot return at the same instant
+        delay = min(self._config.get('reconnect_max_delay', DEFAULT_RECONNECT_MAX_DELAY),
+                    self._config.get('reconnect_delay', DEFAULT_RECONNECT_DELAY) * 2 ** self._attempts)
+        self._attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def update_config(self, config: dict):
+        old = self._config
+        self._config = config
+        old_channels = {fold(channel) for channel in old['channels']}
+        new_channels = {fold(channel) for channel in config['channels']}
+        proto = self._proto
+        if proto is None:
+            # Registration and the welcome JOIN read the new config once reconnected
+            if config['nick'] != old['nick']:
+                self.set_nick(config['nick'])
+                self._bot._network_nick(self)
+            return
+        joins = [channel for channel in config['channels'] if fold(channel) not in old_channels]
+        parts = [channel for channel in old['channels'] if fold(channel) not in new_channels]
+        if joins:
+            proto.cmd_join(joins)
+        if parts:
+            proto.cmd_part(parts)
+        if config['nick'] != old['nick']:
+            # The nick and its pattern change once the server echoes the NICK back
+            proto.cmd_nick(config['nick'])
+
+    def proto_ensure_future(self, proto: IRCProtocol, coro_or_future: Union[CoroutineType, Future]):
+        self._bot._ensure_future(coro_or_future)
+
+    def _track(self, proto: IRCProtocol, message: Message):
+        self._state.handle(message, self._nick)
+        if message.command == 'NICK' and message.prefix.nick == self._nick and message.args:
+            self.set_nick(message.args[0])
+            self._bot._network_nick(self)
+        self._bot._network_state(self, message)
+
+    async def proto_connected(self, proto: IRCProtocol):
+        self._proto = proto
+        for command in StateTracker.COMMANDS:
+            proto.observe(command, self._track)
+        # A fallback nick from an earlier registration is not kept, each connection asks for the configured one
+        nick = self._config['nick']
+        proto.cmd_register(nick, self._config['username'], nick, self._config.get('password'))
+        await self._bot._network_connected(self)
+
+    async def proto_disconnected(self, proto: IRCProtocol):
+        self._proto = None
+        self._state.clear()
+        self._bot._network_disconnected(self)
+        self.connect(self._backoff())
+
+    async def proto_kick(self, proto: IRCProtocol, prefix: Prefix, channel: str, nick: str, message: Optional[str]=None):
+        pass
+
+    async def proto_join(self, proto: IRCProtocol, prefix: Prefix, channel: str):
+        self._bot._network_join(self, prefix.nick, channel)
+
+    async def proto_part(self, proto: IRCProtocol, prefix: Prefix, channel: str, message: Optional[str]=None):
+        pass
+
+    async def proto_registered(self, proto: IRCProtocol, nick: str):
+        # Only a completed registration proves the server will keep us, so the backoff resets here
+        self._attempts = 0
+        # Servers reject JOIN before registration, so channels are joined on welcome
+        proto.cmd_join(self._config['channels'])
+        # The server may have handed us an alternate nick during registration
+        if nick != self._nick:
+            self.set_nick(nick)
+            self._bot._network_nick(self)
+
+    async def proto_privmsg(self, proto: IRCProtocol, prefix: Prefix, target: str, message: str):
+        self._bot._network_privmsg(self, prefix.nick, target, message)
+
+    async def proto_topic(self, proto: IRCProtocol, prefix: Prefix, channel: str, message: Optional[str]=None):
+        pass
@@ -0,0 +1,90 @@
+from typing import Any, Iterable, List, Tuple, Optional, Pattern, Match
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+__all__ = [
+    'PatternMatcher'
+]
+
+
+# Literals shorter than this hit nearly every message and are not worth indexing
+_MIN_LITERAL_LENGTH = 2
+
+
+def _required_literal(pattern: Pattern) -> Optional[str]:
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    runs = []
+    current = []
+
+    def walk(items):
+        for op, value in items:
+            if op is sre_constants.LITERAL:
+                current.append(chr(value))
+            elif op is sre_constants.SUBPATTERN:
+                # A plain group is matched exactly once, so its literals join the run
+                walk(value[-1])
+            else:
+                if current:
+                    runs.append(''.join(current))
+                    del current[:]
+    walk(parsed)
+    if current:
+        runs.append(''.join(current))
+    if not runs:
+        return None
+    literal = max(runs, key=len)
+    if len(literal) < _MIN_LITERAL_LENGTH:
+        return None
+    return literal
+
+
+class PatternMatcher(object):
+    @property
+    def entries(self) -> List[Tuple[Any, Pattern]]:
+        return self._entries
+
+    def __init__(self, entries: Iterable[Tuple[Any, Pattern]]):
+        self._entries = list(entries)
+        self._always = []
+        index = {}
+        for i, (key, pattern) in enumerate(self._entries):
+            literal = _required_literal(pattern)
+            if literal is None:
+                self._always.append(i)
+            else:
+                # Folded so one substring test covers case-sensitive and case-insensitive patterns alike
+                index.setdefault(literal.casefold(), []).append(i)
+        self._literals = list(index.items())
+
+    def _candidates(self, message: str) -> List[int]:
+        # Each literal is one C-level substring search, far cheaper than running its regexes
+        folded = message.casefold()
+        candidates = list(self._always)
+        for literal, indices in self._literals:
+            if literal in folded:
+                candidates += indices
+        candidates.sort()
+        return candidates
+
+    def match(self, message: str) -> List[Tuple[Any, Match]]:
+        matches = []
+        matched = set()
+        entries = self._entries
+        for i in self._candidates(message):
+            key, pattern = entries[i]
+            if key in matched:
+                continue
+            match = pattern.search(message)
+            if match:
+                matched.add(key)
+                matches.append((key, match))
+        return matches
@@ -1,17 +1,44 @@
-from typing import List, Iterable, Tuple
+from typing import List, Iterable, Tuple, Callable, Dict, Optional, Pattern
 from types import ModuleType
 import importlib
+import re
 
 from .plugins import Plugin
-from .plugins.plugin import _Listener
+from .plugins.plugin import _Listener, _compile
+from .pattern_matcher import PatternMatcher
 
 
 __all__ = [
     'Module',
+    'LazyHandler',
+    'compile_manifest',
     'PluginManager'
 ]
 
 
+# Manifest keys and the handler attributes their patterns stand in for
+_MANIFEST_KEYS = (
+    ('listeners', '_listener_patterns'),
+    ('commands', '_commander_patterns')
+)
+
+
+_EVENTS = (
+    'on_load',
+    'on_connected',
+    'on_disconnected',
+    'on_command',
+    'on_msg',
+    'on_private_msg',
+    'on_join',
+    'on_they_join'
+)
+
+
+def _overrides(plugin: Plugin, event: str) -> bool:
+    return getattr(plugin.__class__, event) is not getattr(Plugin, event)
+
+
 class Module(object):
     @property
     def plugins(self) -> List[Plugin]:
@@ -28,7 +55,48 @@ class Module(object):
             if isinstance(cls, type) and issubclass(cls, Plugin):
                 self._plugins.append(cls())
         if len(self._plugins) == 0:
-            raise ImportError('No plugins found in ' + module)
+            raise ImportError('No plugins found in ' + module.__name__)
+
+
+def compile_manifest(manifest) -> Dict[str, List[Pattern]]:
+    # Entries are a pattern or a [pattern, flags] pair, anything else is rejected up front
+    if not isinstance(manifest, dict):
+        raise ValueError('A manifest must be a JSON object')
+    patterns = {}
+    for key, attribute in _MANIFEST_KEYS:
+        entries = manifest.get(key, [])
+        if not isinstance(entries, list):
+            raise ValueError('"{}" must be a list'.format(key))
+        compiled = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = [entry]
+            if (not isinstance(entry, list) or not 1 <= len(entry) <= 2 or
+                    not all(isinstance(part, str) for part in entry)):
+                raise ValueError('Bad "{}" entry: {!r}'.format(key, entry))
+            try:
+                compiled.append(_compile(*entry))
+            except re.error as e:
+                raise ValueError('Bad "{}" pattern {!r}: {}'.format(key, entry[0], e)) from e
+        patterns[attribute] = compiled
+    return patterns
+
+
+class LazyHandler(object):
+    # Matcher key for the patterns of a module that has not been imported yet
+    __slots__ = ('_module_path', '_attribute')
+
+    @property
+    def module_path(self) -> str:
+        return self._module_path
+
+    @property
+    def attribute(self) -> str:
+        return self._attribute
+
+    def __init__(self, module_path: str, attribute: str):
+        self._module_path = module_path
+        self._attribute = attribute
 
 
 class PluginManager(object):
@@ -38,24 +106,107 @@ class PluginManager(object):
 
     @property
     def plugins(self) -> List[Plugin]:
-        plugins = []
-        for module_path, module in self._modules.items():
-            plugins += module.plugins
-        return plugins
+        return self._plugins
+
+    @property
+    def listeners(self) -> PatternMatcher:
+        return self._listeners
+
+    @property
+    def commanders(self) -> PatternMatcher:
+        return self._commanders
 
     def __init__(self):
         self._modules = {}
+        self._lazy = {}
+        self._plugins = []
+        self._handlers = {event: [] for event in _EVENTS}
+        self._listeners = PatternMatcher([])
+        self._commanders = PatternMatcher([])
+
+    def module(self, module_path: str) -> Optional[Module]:
+        return self._modules.get(module_path)
+
+    def handlers(self, event: str) -> List[Callable]:
+        return self._handlers[event]
+
+    def _build_handlers(self) -> Dict[str, List[Callable]]:
+        # Only plugins that actually override a hook get scheduled for it
+        handlers = {}
+        for event in _EVENTS:
+            handlers[event] = [getattr(plugin, event) for plugin in self._plugins if _overrides(plugin, event)]
+        return handlers
+
+    def _matcher_entries(self, plugins: List[Plugin], attribute: str) -> List[Tuple[Callable, Pattern]]:
+        entries = []
+        for plugin in plugins:
+            for method in self.find_attributes(plugin, attribute):
+                # Bound once here so dispatch does not rebind per message
+                handler = method.__get__(plugin, plugin.__class__)
+                for pattern in getattr(method, attribute):
+                    entries.append((handler, pattern))
+        return entries
+
+    def _build_matcher(self, attribute: str) -> PatternMatcher:
+        entries = self._matcher_entries(self._plugins, attribute)
+        for lazy in self._lazy.values():
+            entries += lazy.get(attribute, [])
+        return PatternMatcher(entries)
+
+    def module_matcher(self, module_path: str, attribute: str) -> PatternMatcher:
+        module = self._modules.get(module_path)
+        return PatternMatcher(self._matcher_entries(module.plugins if module is not None else [], attribute))
+
+    def _rebuild(self):
+        plugins = []
+        for module in self._modules.values():
+            plugins += module.plugins
+        self._plugins = plugins
+        self._handlers = self._build_handlers()
+        self._listeners = self._build_matcher('_listener_patterns')
+        self._commanders = self._build_matcher('_commander_patterns')
 
     def find_attributes(self, plugin: Plugin, attribute: str) -> List[_Listener]:
         return [method for method in plugin.__class__.__dict__.values() if hasattr(method, attribute)]
 
     def load_module(self, module_path: str) -> List[Plugin]:
-        try:
-            if module_path in self._modules:
-                module = Module(importlib.reload(self._modules[module_path].module))
-            else:
-                module = Module(importlib.import_module(module_path))
-        except ImportError:
-            return []
+        # Import errors propagate so the caller can report them, the previous version stays registered
+        if module_path in self._modules:
+            module = Module(importlib.reload(self._modules[module_path].module))
+        else:
+            module = Module(importlib.import_module(module_path))
+        self._lazy.pop(module_path, None)
         self._modules[module_path] = module
+        self._rebuild()
         return module.plugins
+
+    def add_modules(self, modules: Iterable[Tuple[str, ModuleType]]) -> List[Tuple[str, List[Plugin]]]:
+        # Registers already imported modules with a single rebuild of the handler tables
+        added = []
+        for module_path, module in modules:
+            try:
+                wrapped = Module(module)
+            except ImportError:
+                continue
+            self._lazy.pop(module_path, None)
+            self._modules[module_path] = wrapped
+            added.append((module_path, wrapped.plugins))
+        self._rebuild()
+        return added
+
+    def add_lazy(self, module_path: str, patterns: Dict[str, List[Pattern]]):
+        # Patterns from the manifest route matching messages to the module until it is imported
+        lazy = {}
+        for attribute, compiled in patterns.items():
+            handler = LazyHandler(module_path, attribute)
+            lazy[attribute] = [(handler, pattern) for pattern in compiled]
+        self._lazy[module_path] = lazy
+        self._rebuild()
+
+    def unload_module(self, module_path: str) -> List[Plugin]:
+        lazy = self._lazy.pop(module_path, None)
+        module = self._modules.pop(module_path, None)
+        if module is None and lazy is None:
+            return []
+        self._rebuild()
+        return module.plugins if module is not None else []
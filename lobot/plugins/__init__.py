@@ -1,2 +1,2 @@
-from .plugin import Plugin, listen, command
+from .plugin import Plugin, listen, command, offload
 from .http import HTTPPlugin
\ No newline at end of file
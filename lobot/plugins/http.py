@@ -1,21 +1,79 @@
 from asyncio import AbstractEventLoop, StreamReader, StreamWriter
-from typing import Optional, Dict, Tuple
-from email.utils import formatdate
+from typing import Optional, Dict, Tuple, Awaitable, Any, Iterable, Union, Callable
+from email.utils import formatdate, parsedate_to_datetime
+from collections import OrderedDict, deque
 from urllib.parse import urlsplit
 from abc import ABC
 import asyncio
+import weakref
 import json
+import zlib
+import ssl
+import sys
 
 from lobot.plugins import Plugin
+from lobot.resolver import Resolver
 
 
 __all__ = [
+    'HTTPError',
+    'HTTPTimeoutError',
     'HTTPResponse',
+    'HTTPStreamResponse',
     'HTTPSession',
+    'HTTPConnectionPool',
+    'HTTPCache',
     'HTTPPlugin'
 ]
 
 
+DEFAULT_MAX_IDLE_TIME = 30.0
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 4
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_CACHE_SIZE = 8 * 1024 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
+
+
+_PoolKey = Tuple[str, int, bool]
+_CacheKey = Tuple[str, int, bool, str]
+_READ_SIZE = 64 * 1024
+_MAX_SESSIONS = 256
+
+
+def _get_header(headers: Dict[str, str], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _wants_close(version: str, headers: Dict[str, str]) -> bool:
+    connection = _get_header(headers, 'Connection')
+    if connection is not None:
+        return connection.lower() == 'close'
+    # HTTP/1.0 connections are closed unless the server opts in to keep-alive
+    return version != 'HTTP/1.1'
+
+
+class HTTPError(Exception):
+    pass
+
+
+class HTTPTimeoutError(HTTPError):
+    pass
+
+
+async def _deadline(awaitable: Awaitable, timeout: Optional[float], what: str) -> Any:
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise HTTPTimeoutError(what + ' timed out after ' + str(timeout) + ' seconds')
+
+
 class HTTPResponse(object):
     @property
     def status(self) -> int:
@@ -39,6 +97,158 @@ class HTTPResponse(object):
         self._data = data
 
 
+class HTTPStreamResponse(object):
+    @property
+    def status(self) -> int:
+        return self._status
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self._headers
+
+    @property
+    def complete(self) -> bool:
+        return self._complete and (self._decoder is None or not self._decoder.unconsumed_tail)
+
+    @property
+    def reusable(self) -> bool:
+        return self.complete and self._keep_alive
+
+    def __init__(self, reader: StreamReader, version: str, status: int, headers: Dict[str, str],
+                 has_body: bool=True, max_size: Optional[int]=None, read_timeout: Optional[float]=None):
+        self._reader = reader
+        self._read_timeout = read_timeout
+        self._status = status
+        self._headers = headers
+        self._max_size = max_size
+        self._received = 0
+        self._chunk_remaining = 0
+        self._keep_alive = not _wants_close(version, headers)
+        self._complete = not has_body
+        self._chunked = False
+        self._remaining = None
+        self._decoder = None
+        self._encoding = None
+        self._inflated = False
+        if has_body:
+            transfer_encoding = _get_header(headers, 'Transfer-Encoding')
+            content_length = _get_header(headers, 'Content-Length')
+            if transfer_encoding is not None and 'chunked' in transfer_encoding.lower():
+                self._chunked = True
+            elif content_length is not None:
+                self._remaining = int(content_length)
+                self._complete = self._remaining == 0
+            else:
+                # Body runs until the server closes the connection
+                self._keep_alive = False
+            content_encoding = (_get_header(headers, 'Content-Encoding') or '').strip().lower()
+            if content_encoding in ('gzip', 'x-gzip'):
+                self._encoding = 'gzip'
+                self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            elif content_encoding == 'deflate':
+                self._encoding = 'deflate'
+                self._decoder = zlib.decompressobj(zlib.MAX_WBITS)
+
+    def __aiter__(self) -> 'HTTPStreamResponse':
+        return self
+
+    async def __anext__(self) -> bytes:
+        chunk = await self.read_chunk()
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+    async def read_chunk(self) -> bytes:
+        if self._decoder is None:
+            chunk = await self._read_raw()
+        else:
+            chunk = await self._read_decoded()
+        self._received += len(chunk)
+        if self._max_size is not None and self._received > self._max_size:
+            raise HTTPError('Response body exceeds ' + str(self._max_size) + ' bytes')
+        return chunk
+
+    async def _read_decoded(self) -> bytes:
+        while True:
+            decoder = self._decoder
+            if decoder.unconsumed_tail:
+                data = decoder.unconsumed_tail
+            else:
+                data = await self._read_raw()
+                if not data:
+                    return decoder.flush()
+            try:
+                # Bounded output keeps a small compressed body from inflating all at once
+                chunk = decoder.decompress(data, _READ_SIZE)
+            except zlib.error as e:
+                if self._encoding == 'deflate' and not self._inflated:
+                    # Some servers send raw deflate data without the zlib wrapper
+                    self._decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+                    self._encoding = 'raw-deflate'
+                    chunk = self._decoder.decompress(data, _READ_SIZE)
+                else:
+                    raise HTTPError('Could not decode response body: ' + str(e))
+            self._inflated = True
+            if chunk:
+                return chunk
+
+    async def _read_raw(self) -> bytes:
+        if self._complete:
+            return b''
+        if self._chunked:
+            chunk = await self._read_chunked()
+        elif self._remaining is not None:
+            chunk = await self._read(min(self._remaining, _READ_SIZE))
+            if not chunk:
+                raise HTTPError('Connection closed before the response body was complete')
+            self._remaining -= len(chunk)
+            self._complete = self._remaining == 0
+        else:
+            chunk = await self._read(_READ_SIZE)
+            self._complete = not chunk
+        return chunk
+
+    async def _read(self, size: int) -> bytes:
+        return await _deadline(self._reader.read(size), self._read_timeout, 'Response read')
+
+    async def _readline(self) -> bytes:
+        return await _deadline(self._reader.readline(), self._read_timeout, 'Response read')
+
+    async def _read_chunked(self) -> bytes:
+        if self._chunk_remaining == 0:
+            size_line = await self._readline()
+            if not size_line:
+                raise HTTPError('Connection closed before the response body was complete')
+            try:
+                self._chunk_remaining = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPError('Malformed chunk size: ' + size_line.decode('latin-1'))
+            if self._chunk_remaining == 0:
+                # Skip trailers up to the blank line that ends the message
+                while True:
+                    line = await self._readline()
+                    if not line or line == b'\r\n' or line == b'\n':
+                        break
+                self._complete = True
+                return b''
+        chunk = await self._read(min(self._chunk_remaining, _READ_SIZE))
+        if not chunk:
+            raise HTTPError('Connection closed before the response body was complete')
+        self._chunk_remaining -= len(chunk)
+        if self._chunk_remaining == 0:
+            await self._readline()
+        return chunk
+
+    async def read(self) -> bytes:
+        chunks = []
+        while True:
+            chunk = await self.read_chunk()
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+
 class HTTPSession(ABC):
     async def __aenter__(self) -> 'HTTPSession':
         raise NotImplementedError
@@ -62,26 +272,258 @@ class HTTPSession(ABC):
                      headers: Optional[Dict[str, str]]=None) -> HTTPResponse:
         raise NotImplementedError
 
+    async def stream(self, method: str, resource: str, data: Optional[bytes]=None,
+                     headers: Optional[Dict[str, str]]=None,
+                     max_size: Optional[int]=None) -> HTTPStreamResponse:
+        raise NotImplementedError
 
-class _HTTPClient(HTTPSession):
-    def __init__(self, loop: AbstractEventLoop, hostname: str, port: Optional[int]=80, ssl: Optional[bool]=False):
+
+class _ResumingSSLContext(ssl.SSLContext):
+    # asyncio has no way to pass a session through open_connection, so the
+    # context hands the last session for a host to every new SSLObject itself
+    def __init__(self, protocol: int):
+        self._sessions = OrderedDict()
+
+    def remember(self, hostname: str, ssl_object: ssl.SSLObject):
+        if ssl_object.session is not None:
+            self._sessions[hostname] = ssl_object.session
+            self._sessions.move_to_end(hostname)
+            # Only the most recently used hosts keep a session to resume
+            if len(self._sessions) > _MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+
+    def forget(self, hostname: str):
+        self._sessions.pop(hostname, None)
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and not server_side and server_hostname is not None:
+            session = self._sessions.get(server_hostname)
+        return super().wrap_bio(incoming, outgoing, server_side=server_side,
+                                server_hostname=server_hostname, session=session)
+
+
+def _create_ssl_context() -> _ResumingSSLContext:
+    context = _ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.verify_mode = ssl.CERT_REQUIRED
+    context.check_hostname = True
+    context.load_default_certs()
+    return context
+
+
+class _Connection(object):
+    @property
+    def key(self) -> _PoolKey:
+        return self._key
+
+    @property
+    def reader(self) -> StreamReader:
+        return self._reader
+
+    @property
+    def writer(self) -> StreamWriter:
+        return self._writer
+
+    @property
+    def healthy(self) -> bool:
+        return not self._writer.transport.is_closing() and not self._reader.at_eof()
+
+    @property
+    def ssl_object(self) -> Optional[ssl.SSLObject]:
+        return self._writer.get_extra_info('ssl_object')
+
+    def __init__(self, key: _PoolKey, reader: StreamReader, writer: StreamWriter):
+        self._key = key
+        self._reader = reader
+        self._writer = writer
+        self.last_used = 0.0
+
+    def close(self):
+        self._writer.close()
+
+
+class _HostLimit(object):
+    def __init__(self, size: int):
+        self.semaphore = asyncio.Semaphore(size)
+        self.users = 0
+
+
+class HTTPConnectionPool(object):
+    @property
+    def max_idle_time(self) -> float:
+        return self._max_idle_time
+
+    @property
+    def max_connections_per_host(self) -> int:
+        return self._max_connections_per_host
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections
+
+    @property
+    def connect_timeout(self) -> Optional[float]:
+        return self._connect_timeout
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self._read_timeout
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        if self._ssl_context is None:
+            self._ssl_context = _create_ssl_context()
+        return self._ssl_context
+
+    def __init__(self, loop: AbstractEventLoop, max_idle_time: float=DEFAULT_MAX_IDLE_TIME,
+                 max_connections_per_host: int=DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                 connect_timeout: Optional[float]=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: Optional[float]=DEFAULT_READ_TIMEOUT,
+                 max_connections: int=DEFAULT_MAX_CONNECTIONS, resolver: Optional[Resolver]=None):
         self._loop = loop
+        self._resolver = resolver
+        self._max_connections = max_connections
+        self._total_limit = asyncio.Semaphore(max_connections)
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._max_idle_time = max_idle_time
+        self._max_connections_per_host = max_connections_per_host
+        self._idle = {}
+        self._limits = {}
+        self._purge_handle = None
+        self._ssl_context = None
+
+    async def _connect(self, key: _PoolKey) -> _Connection:
+        return await _deadline(self._open(key), self._connect_timeout,
+                               'Connecting to ' + key[0] + ':' + str(key[1]))
+
+    async def _open(self, key: _PoolKey) -> _Connection:
+        hostname, port, use_ssl = key
+        if self._resolver is None:
+            address = dict(host=hostname, port=port)
+        else:
+            address = dict(sock=await self._resolver.open_socket(hostname, port))
+        if not use_ssl:
+            reader, writer = await asyncio.open_connection(**address)
+            return _Connection(key, reader, writer)
+        context = self.ssl_context
+        try:
+            reader, writer = await asyncio.open_connection(ssl=context, server_hostname=hostname, **address)
+        except ssl.SSLError:
+            # Never retry a handshake with a session the server just rejected
+            context.forget(hostname)
+            raise
+        return _Connection(key, reader, writer)
+
+    async def acquire(self, hostname: str, port: int, ssl: bool) -> _Connection:
+        key = (hostname, port, ssl)
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = _HostLimit(self._max_connections_per_host)
+        limit.users += 1
+        # Wait on the host first so a busy host cannot hold global slots while queued
+        try:
+            await limit.semaphore.acquire()
+        except BaseException:
+            self._leave_limit(key)
+            raise
+        try:
+            await self._total_limit.acquire()
+        except BaseException:
+            limit.semaphore.release()
+            self._leave_limit(key)
+            raise
+        try:
+            idle = self._idle.get(key)
+            deadline = self._loop.time() - self._max_idle_time
+            # Most recently used sockets are the least likely to have been dropped by the server
+            while idle:
+                connection = idle.pop()
+                if connection.last_used >= deadline and connection.healthy:
+                    return connection
+                connection.close()
+            return await self._connect(key)
+        except BaseException:
+            self._total_limit.release()
+            limit.semaphore.release()
+            self._leave_limit(key)
+            raise
+
+    def _leave_limit(self, key: _PoolKey):
+        limit = self._limits[key]
+        limit.users -= 1
+        # An unheld semaphore is as good as a new one, so hosts seen once are not kept forever
+        if limit.users == 0:
+            del self._limits[key]
+
+    def release(self, connection: _Connection, reusable: bool):
+        self._total_limit.release()
+        self._limits[connection.key].semaphore.release()
+        self._leave_limit(connection.key)
+        ssl_object = connection.ssl_object
+        if ssl_object is not None:
+            # TLS 1.3 tickets arrive after the handshake, so sessions are captured after use
+            self.ssl_context.remember(connection.key[0], ssl_object)
+        if not reusable or not connection.healthy:
+            connection.close()
+            return
+        connection.last_used = self._loop.time()
+        self._idle.setdefault(connection.key, []).append(connection)
+        if self._purge_handle is None:
+            self._purge_handle = self._loop.call_later(self._max_idle_time, self._purge)
+
+    def _purge(self):
+        self._purge_handle = None
+        deadline = self._loop.time() - self._max_idle_time
+        for key, idle in list(self._idle.items()):
+            fresh = []
+            for connection in idle:
+                if connection.last_used >= deadline and connection.healthy:
+                    fresh.append(connection)
+                else:
+                    connection.close()
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+        if self._idle:
+            self._purge_handle = self._loop.call_later(self._max_idle_time, self._purge)
+
+    def close(self):
+        if self._purge_handle is not None:
+            self._purge_handle.cancel()
+            self._purge_handle = None
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+        self._idle.clear()
+
+
+class _HTTPClient(HTTPSession):
+    def __init__(self, pool: HTTPConnectionPool, hostname: str, port: Optional[int]=80, ssl: Optional[bool]=False):
+        self._pool = pool
         self._hostname = hostname
         self._port = port
         self._ssl = ssl
+        self._connection = None
+        self._response = None
 
     async def __aenter__(self) -> HTTPSession:
-        self._reader, self._writer = await self._connect()
+        self._connection = await self._pool.acquire(self._hostname, self._port, self._ssl)
+        self._reader, self._writer = self._connection.reader, self._connection.writer
         return self
 
-    async def __aexit__(self, *args):
-        self._writer.close()
-
-    async def _connect(self) -> Tuple[StreamReader, StreamWriter]:
-        return await asyncio.open_connection(host=self._hostname, port=self._port, loop=self._loop)
-
-    async def _send(self, request: str, data: Optional[bytes]=None,
-                    headers: Optional[Dict[str, str]]=None) -> HTTPResponse:
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # A request that failed part way leaves the stream in an unknown state
+        reusable = exc_type is None and (self._response is None or self._response.reusable)
+        self._pool.release(self._connection, reusable)
+        self._connection = None
+        self._response = None
+
+    async def _open(self, request: str, data: Optional[bytes]=None,
+                    headers: Optional[Dict[str, str]]=None, has_body: bool=True,
+                    max_size: Optional[int]=None) -> HTTPStreamResponse:
+        if self._response is not None and not self._response.complete:
+            raise HTTPError('The previous response body has not been fully read')
         host = 'Host: ' + self._hostname + ':' + str(self._port)
         message = [
             request,
@@ -90,13 +532,13 @@ class _HTTPClient(HTTPSession):
         send_headers = {
             'Connection': 'keep-alive',
             'Accept': '*/*',
-            # 'Accept-Encoding: gzip',
+            'Accept-Encoding': 'gzip, deflate',
             'Date': formatdate(timeval=None, localtime=False, usegmt=True)
         }
         if headers is not None:
             send_headers.update(headers)
         if data:
-            headers['Content-Length'] = str(len(data))
+            send_headers['Content-Length'] = str(len(data))
         for key, value in send_headers.items():
             message.append(key + ': ' + value)
         full_request = '\r\n'.join(message) + '\r\n\r\n'
@@ -104,23 +546,35 @@ class _HTTPClient(HTTPSession):
         if data:
             self._writer.write(data)
         # Parse Status Code
-        status = int((await self._reader.readline()).decode('latin-1').split(' ')[1])
+        read_timeout = self._pool.read_timeout
+        status_line = await _deadline(self._reader.readline(), read_timeout, 'Response read')
+        if not status_line:
+            raise HTTPError('Connection closed before a response was received')
+        version, status = status_line.decode('latin-1').split(' ')[:2]
+        status = int(status)
         response_headers = dict()
         # Parse Headers
         while True:
-            line = await self._reader.readline()
-            if line is None or line == b'\r\n':
+            line = await _deadline(self._reader.readline(), read_timeout, 'Response read')
+            if not line or line == b'\r\n' or line == b'\n':
                 break
-            header_name, header_value = line.decode('latin-1').rstrip().split(' ', 1)
-            # Remove : from header name
-            response_headers[header_name[:-1]] = header_value
-        response_length = int(response_headers['Content-Length'])
-        response_data = await self._reader.read(response_length)
-        return HTTPResponse(status, response_headers, response_data)
+            header_name, _, header_value = line.decode('latin-1').partition(':')
+            response_headers[header_name.strip()] = header_value.strip()
+        # Informational, No Content and Not Modified responses never carry a body
+        if status < 200 or status in (204, 304):
+            has_body = False
+        self._response = HTTPStreamResponse(self._reader, version, status, response_headers,
+                                            has_body, max_size, read_timeout)
+        return self._response
+
+    async def _send(self, request: str, data: Optional[bytes]=None,
+                    headers: Optional[Dict[str, str]]=None, has_body: bool=True) -> HTTPResponse:
+        response = await self._open(request, data, headers, has_body)
+        return HTTPResponse(response.status, response.headers, await response.read())
 
     async def _method(self, method: str, resource: str, data: Optional[bytes]=None,
                       headers: Optional[Dict[str, str]]=None) -> HTTPResponse:
-        return await self._send(method + ' ' + resource + ' HTTP/1.1', data, headers)
+        return await self._send(method + ' ' + resource + ' HTTP/1.1', data, headers, method != 'HEAD')
 
     async def get(self, resource: str, data: Optional[bytes]=None,
                   headers: Optional[Dict[str, str]]=None) -> HTTPResponse:
@@ -138,8 +592,268 @@ class _HTTPClient(HTTPSession):
                      headers: Optional[Dict[str, str]]=None) -> HTTPResponse:
         return await self._method('DELETE', resource, data, headers)
 
+    async def stream(self, method: str, resource: str, data: Optional[bytes]=None,
+                     headers: Optional[Dict[str, str]]=None,
+                     max_size: Optional[int]=None) -> HTTPStreamResponse:
+        return await self._open(method + ' ' + resource + ' HTTP/1.1', data, headers,
+                                method != 'HEAD', max_size)
+
+
+class _HTTPStream(object):
+    def __init__(self, session: HTTPSession, method: str, resource: str, data: Optional[bytes],
+                 headers: Optional[Dict[str, str]], max_size: Optional[int]):
+        self._session = session
+        self._method = method
+        self._resource = resource
+        self._data = data
+        self._headers = headers
+        self._max_size = max_size
+
+    async def __aenter__(self) -> HTTPStreamResponse:
+        await self._session.__aenter__()
+        try:
+            return await self._session.stream(self._method, self._resource, self._data,
+                                              self._headers, self._max_size)
+        except BaseException:
+            await self._session.__aexit__(*sys.exc_info())
+            raise
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._session.__aexit__(exc_type, exc_value, traceback)
+
+
+def _parse_cache_control(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for directive in (_get_header(headers, 'Cache-Control') or '').split(','):
+        name, _, value = directive.partition('=')
+        name = name.strip().lower()
+        if name:
+            directives[name] = value.strip().strip('"') or None
+    return directives
+
+
+def _freshness_lifetime(headers: Dict[str, str], default_ttl: Optional[float]) -> Optional[float]:
+    directives = _parse_cache_control(headers)
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0
+    try:
+        if 'max-age' in directives:
+            lifetime = float(directives['max-age'])
+        elif _get_header(headers, 'Expires') is not None:
+            expires = parsedate_to_datetime(_get_header(headers, 'Expires'))
+            date = parsedate_to_datetime(_get_header(headers, 'Date'))
+            lifetime = (expires - date).total_seconds()
+        else:
+            return default_ttl
+        lifetime -= float(_get_header(headers, 'Age') or 0)
+    except (TypeError, ValueError):
+        # Unparseable dates mean the response is already stale
+        return 0.0
+    return max(lifetime, 0.0)
+
+
+class _CacheEntry(object):
+    @property
+    def response(self) -> HTTPResponse:
+        return self._response
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        validators = {}
+        etag = _get_header(self._response.headers, 'ETag')
+        if etag is not None:
+            validators['If-None-Match'] = etag
+        last_modified = _get_header(self._response.headers, 'Last-Modified')
+        if last_modified is not None:
+            validators['If-Modified-Since'] = last_modified
+        return validators
+
+    def __init__(self, response: HTTPResponse, expires: float):
+        self._response = response
+        self._size = len(response.data) + sum(len(k) + len(v) for k, v in response.headers.items())
+        self.expires = expires
+
+
+class HTTPCache(object):
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def __init__(self, loop: AbstractEventLoop, max_size: int=DEFAULT_CACHE_SIZE):
+        self._loop = loop
+        self._max_size = max_size
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._entries = OrderedDict()
+
+    def lookup(self, key: _CacheKey) -> Optional[_CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def fresh(self, entry: _CacheEntry) -> bool:
+        fresh = entry.expires > self._loop.time()
+        if fresh:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return fresh
+
+    def store(self, key: _CacheKey, response: HTTPResponse, default_ttl: Optional[float]=None):
+        self._remove(key)
+        if response.status != 200:
+            return
+        lifetime = _freshness_lifetime(response.headers, default_ttl)
+        if lifetime is None:
+            return
+        entry = _CacheEntry(response, self._loop.time() + lifetime)
+        # Stale entries are only worth keeping if they can be revalidated
+        if lifetime <= 0 and not entry.validators:
+            return
+        if entry.size > self._max_size:
+            return
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._size > self._max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def revalidated(self, key: _CacheKey, entry: _CacheEntry, not_modified: HTTPResponse,
+                    default_ttl: Optional[float]=None) -> HTTPResponse:
+        # A 304 carries updated metadata for the body we already hold
+        headers = dict(entry.response.headers)
+        headers.update(not_modified.headers)
+        response = HTTPResponse(entry.response.status, headers, entry.response.data)
+        self.store(key, response, default_ttl)
+        return response
+
+    def _remove(self, key: _CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+
+class _OrderedFetches(object):
+    def __init__(self, loop: AbstractEventLoop, fetch: Callable[[str], Awaitable[HTTPResponse]],
+                 urls: Iterable[str], window: int, return_exceptions: bool):
+        self._loop = loop
+        self._fetch = fetch
+        self._urls = iter(urls)
+        self._window = max(1, window)
+        self._return_exceptions = return_exceptions
+        self._tasks = deque()
+        self._fill()
+
+    def _fill(self):
+        # Only a window of requests is in flight, later URLs start as results are consumed
+        while len(self._tasks) < self._window:
+            url = next(self._urls, None)
+            if url is None:
+                return
+            self._tasks.append(self._loop.create_task(self._fetch(url)))
+
+    def __aiter__(self) -> '_OrderedFetches':
+        return self
+
+    async def __aenter__(self) -> '_OrderedFetches':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def __anext__(self) -> Union[HTTPResponse, Exception]:
+        if not self._tasks:
+            raise StopAsyncIteration
+        task = self._tasks[0]
+        try:
+            response = await task
+        except asyncio.CancelledError:
+            # The consumer was cancelled, so nobody will read the remaining results
+            self.cancel()
+            raise
+        except Exception as e:
+            if not self._return_exceptions:
+                self.cancel()
+                raise
+            response = e
+        self._tasks.popleft()
+        self._fill()
+        return response
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        self._urls = iter(())
+
+    async def aclose(self):
+        # Leaving the loop early would otherwise let every in-flight fetch run on unobserved
+        tasks = list(self._tasks)
+        self.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+
+_POOLS = weakref.WeakKeyDictionary()
+_CACHES = weakref.WeakKeyDictionary()
+
 
 class HTTPPlugin(Plugin):
+    # Opt in to the shared response cache for http_get
+    http_cache = False
+    # Seconds to keep responses that carry no freshness information
+    http_cache_ttl = None
+
+    @property
+    def http_response_cache(self) -> HTTPCache:
+        cache = _CACHES.get(self._bridge)
+        if cache is None:
+            config = self._bridge.config['lobot']
+            cache = _CACHES[self._bridge] = HTTPCache(self._bridge.loop,
+                                                       config.get('http_cache_size', DEFAULT_CACHE_SIZE))
+        return cache
+
+    @property
+    def http_pool(self) -> HTTPConnectionPool:
+        # One pool per bot, shared by every HTTPPlugin attached to it
+        pool = _POOLS.get(self._bridge)
+        if pool is None:
+            config = self._bridge.config['lobot']
+            pool = _POOLS[self._bridge] = HTTPConnectionPool(
+                self._bridge.loop,
+                max_idle_time=config.get('http_max_idle_time', DEFAULT_MAX_IDLE_TIME),
+                max_connections_per_host=config.get('http_max_connections_per_host',
+                                                    DEFAULT_MAX_CONNECTIONS_PER_HOST),
+                connect_timeout=config.get('http_connect_timeout', DEFAULT_CONNECT_TIMEOUT),
+                read_timeout=config.get('http_read_timeout', DEFAULT_READ_TIMEOUT),
+                max_connections=config.get('http_max_connections', DEFAULT_MAX_CONNECTIONS),
+                resolver=self._bridge.resolver)
+        return pool
+
     def _decompose(self, url: str) -> Tuple[str, str, int, bool]:
         url_components = urlsplit(url)
         resource = url_components.path or '/'
@@ -154,12 +868,27 @@ class HTTPPlugin(Plugin):
         return url_components.hostname, resource, port, ssl
 
     def http_session(self, hostname: str, port: Optional[int]=80, ssl: Optional[bool]=False) -> HTTPSession:
-        return _HTTPClient(self._bridge.loop, hostname, port, ssl)
+        return _HTTPClient(self.http_pool, hostname, port, ssl)
 
     async def http_get(self, url: str, data: Optional[bytes]=None) -> HTTPResponse:
         hostname, resource, port, ssl = self._decompose(url)
+        if not self.http_cache or data:
+            async with self.http_session(hostname, port, ssl) as session:
+                return await session.get(resource, data)
+        cache = self.http_response_cache
+        key = (hostname, port, ssl, resource)
+        entry = cache.lookup(key)
+        headers = None
+        if entry is not None:
+            if cache.fresh(entry):
+                return entry.response
+            headers = entry.validators
         async with self.http_session(hostname, port, ssl) as session:
-            return await session.get(resource, data)
+            response = await session.get(resource, data, headers)
+        if response.status == 304 and entry is not None:
+            return cache.revalidated(key, entry, response, self.http_cache_ttl)
+        cache.store(key, response, self.http_cache_ttl)
+        return response
 
     async def http_post(self, url: str, data: Optional[bytes]=None) -> HTTPResponse:
         hostname, resource, port, ssl = self._decompose(url)
@@ -174,4 +903,16 @@ class HTTPPlugin(Plugin):
     async def http_delete(self, url: str, data: Optional[bytes]=None) -> HTTPResponse:
         hostname, resource, port, ssl = self._decompose(url)
         async with self.http_session(hostname, port, ssl) as session:
-            return await session.delete(resource, data)
\ No newline at end of file
+            return await session.delete(resource, data)
+
+    def http_get_many(self, urls: Iterable[str], concurrency: Optional[int]=None,
+                      return_exceptions: bool=False) -> _OrderedFetches:
+        if concurrency is None:
+            concurrency = self.http_pool.max_connections
+        return _OrderedFetches(self._bridge.loop, self.http_get, urls, concurrency, return_exceptions)
+
+    def http_stream(self, url: str, method: str='GET', data: Optional[bytes]=None,
+                    headers: Optional[Dict[str, str]]=None,
+                    max_size: Optional[int]=None) -> _HTTPStream:
+        hostname, resource, port, ssl = self._decompose(url)
+        return _HTTPStream(self.http_session(hostname, port, ssl), method, resource, data, headers, max_size)
@@ -1,15 +1,21 @@
+from concurrent.futures import Executor
 from abc import ABC, abstractmethod
-from typing import Callable, Any
+from typing import Callable, Any, Optional
+import contextvars
+import functools
 import asyncio
 import re
 
 
 from ..irc.protocol import IRCProtocol
+from ..irc.state import StateTracker
+from ..resolver import Resolver
 
 
 __all__ = [
     'listen',
     'command',
+    'offload',
     'Plugin'
 ]
 
@@ -18,24 +24,47 @@ _Listener = Callable[[Any, str, str, str, Any], asyncio.Future]
 _FLAGSMAP = {'i': re.IGNORECASE, 's': re.DOTALL}
 
 
-def _raw_wrap(pattern: str, attribute: str, flags: str='') -> Callable[[_Listener], _Listener]:
+def _compile(pattern: str, flags: str=''):
+    re_flags = 0
+    for c in flags:
+        re_flags |= _FLAGSMAP.get(c, 0)
+    return re.compile(pattern, flags=re_flags)
+
+
+def _raw_wrap(pattern: str, attribute: str, flags: str='',
+              timeout: Optional[float]=None) -> Callable[[_Listener], _Listener]:
     def wrap(listener: _Listener) -> _Listener:
         if not hasattr(listener, attribute):
             setattr(listener, attribute, [])
-        re_flags = 0
-        for c in flags:
-            re_flags |= _FLAGSMAP.get(c, 0)
-        getattr(listener, attribute).append(re.compile(pattern, flags=re_flags))
+        getattr(listener, attribute).append(_compile(pattern, flags))
+        if timeout is not None:
+            listener._handler_timeout = timeout
         return listener
     return wrap
 
 
-def listen(pattern: str, flags: str='') -> Callable[[_Listener], _Listener]:
-    return _raw_wrap(pattern, '_listener_patterns', flags)
+def listen(pattern: str, flags: str='', timeout: Optional[float]=None) -> Callable[[_Listener], _Listener]:
+    return _raw_wrap(pattern, '_listener_patterns', flags, timeout)
+
+
+def command(pattern: str, flags: str='', timeout: Optional[float]=None) -> Callable[[_Listener], _Listener]:
+    return _raw_wrap(pattern, '_commander_patterns', flags, timeout)
 
 
-def command(pattern: str, flags: str='') -> Callable[[_Listener], _Listener]:
-    return _raw_wrap(pattern, '_commander_patterns', flags)
+def offload(handler: Callable[..., Any]) -> _Listener:
+    # Runs a plain (non-async) handler body on the bot's thread pool
+    @functools.wraps(handler)
+    async def wrapper(self, *args, **kwargs):
+        return await self.run_in_executor(functools.partial(handler, self, *args, **kwargs))
+    return wrapper
+
+
+def _on_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_event_loop() is loop
+    except RuntimeError:
+        # Worker threads have no event loop of their own
+        return False
 
 
 class _Bridge(ABC):
@@ -59,8 +88,30 @@ class _Bridge(ABC):
     def nick(self) -> str:
         raise NotImplementedError
 
+    @property
+    @abstractmethod
+    def network(self) -> str:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def state(self) -> StateTracker:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def resolver(self) -> Resolver:
+        raise NotImplementedError
+
+    @abstractmethod
+    def executor(self, process: bool=False) -> Executor:
+        raise NotImplementedError
+
 
 class Plugin(object):
+    # Seconds any handler of this plugin may run before it is cancelled
+    handler_timeout = None
+
     def _attach(self, module_path: str, bridge: _Bridge):
         self._module_path = module_path
         self._bridge = bridge
@@ -69,18 +120,43 @@ class Plugin(object):
     def nick(self) -> str:
         return self._bridge.nick
 
+    @property
+    def network(self) -> str:
+        return self._bridge.network
+
+    @property
+    def state(self) -> StateTracker:
+        return self._bridge.state
+
     @property
     def config(self) -> dict:
         return self._bridge.config.get(self._module_path)
 
-    def say(self, target: str, message: str):
+    def _call_on_loop(self, func: Callable[..., None], *args):
+        # Offloaded handlers call say/reply from worker threads
+        loop = self._bridge.loop
+        if _on_loop_thread(loop):
+            func(*args)
+        else:
+            loop.call_soon_threadsafe(func, *args)
+
+    def _privmsg(self, target: str, message: str):
         self._bridge.proto.cmd_privmsg(target, message)
 
+    def say(self, target: str, message: str):
+        self._call_on_loop(self._privmsg, target, message)
+
     def reply(self, nick: str, me_or_chan: str, message: str):
         if me_or_chan == self._bridge.nick:
-             self._bridge.proto.cmd_privmsg(nick, message)
+             self.say(nick, message)
         else:
-             self._bridge.proto.cmd_privmsg(me_or_chan, message)
+             self.say(me_or_chan, message)
+
+    async def run_in_executor(self, func: Callable[..., Any], *args, process: bool=False) -> Any:
+        if not process:
+            # Threads keep the handler's network so say() from them reaches the right connection
+            func = functools.partial(contextvars.copy_context().run, func)
+        return await self._bridge.loop.run_in_executor(self._bridge.executor(process), func, *args)
 
     async def on_load(self):
         pass
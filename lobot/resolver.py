@@ -0,0 +1,129 @@
+from asyncio import AbstractEventLoop
+from collections import OrderedDict
+from typing import List, Tuple, Any
+import itertools
+import asyncio
+import socket
+
+
+__all__ = [
+    'Resolver'
+]
+
+
+DEFAULT_TTL = 300.0
+DEFAULT_CACHE_SIZE = 1024
+# RFC 8305 recommends 250ms between connection attempts
+DEFAULT_ATTEMPT_DELAY = 0.25
+
+
+_AddrInfo = Tuple[int, int, int, str, Tuple[Any, ...]]
+
+
+def _interleave(addrinfos: List[_AddrInfo]) -> List[_AddrInfo]:
+    # Alternate address families so a broken IPv6 path cannot stall every attempt
+    families = {}
+    for addrinfo in addrinfos:
+        families.setdefault(addrinfo[0], []).append(addrinfo)
+    interleaved = []
+    for group in itertools.zip_longest(*families.values()):
+        interleaved.extend(addrinfo for addrinfo in group if addrinfo is not None)
+    return interleaved
+
+
+async def _attempt(loop: AbstractEventLoop, addrinfo: _AddrInfo) -> socket.socket:
+    family, type_, proto, _, address = addrinfo
+    sock = socket.socket(family, type_, proto)
+    try:
+        sock.setblocking(False)
+        await loop.sock_connect(sock, address)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+class Resolver(object):
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def __init__(self, loop: AbstractEventLoop, ttl: float=DEFAULT_TTL,
+                 attempt_delay: float=DEFAULT_ATTEMPT_DELAY, cache_size: int=DEFAULT_CACHE_SIZE):
+        self._loop = loop
+        self._ttl = ttl
+        self._attempt_delay = attempt_delay
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pending = {}
+
+    async def resolve(self, host: str, port: int) -> List[_AddrInfo]:
+        key = (host, port)
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires, addrinfos = entry
+            if expires > self._loop.time():
+                self._cache.move_to_end(key)
+                return addrinfos
+            del self._cache[key]
+        # Concurrent lookups of the same name share one getaddrinfo call
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._lookup(key))
+            pending.add_done_callback(lambda future: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, key: Tuple[str, int]) -> List[_AddrInfo]:
+        host, port = key
+        addrinfos = await self._loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        if not addrinfos:
+            raise OSError('Could not resolve ' + host)
+        self._cache[key] = (self._loop.time() + self._ttl, addrinfos)
+        # Plugins look up whatever hosts users post, so the least recently used names are dropped
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return addrinfos
+
+    def invalidate(self, host: str, port: int):
+        self._cache.pop((host, port), None)
+
+    async def open_socket(self, host: str, port: int) -> socket.socket:
+        addrinfos = _interleave(await self.resolve(host, port))
+        try:
+            return await self._race(addrinfos)
+        except OSError:
+            # The cached addresses may be what went stale during the outage
+            self.invalidate(host, port)
+            raise
+
+    async def _race(self, addrinfos: List[_AddrInfo]) -> socket.socket:
+        remaining = iter(addrinfos)
+        attempts = set()
+        errors = []
+        exhausted = False
+        try:
+            while True:
+                if not exhausted:
+                    addrinfo = next(remaining, None)
+                    if addrinfo is None:
+                        exhausted = True
+                    else:
+                        attempts.add(asyncio.ensure_future(_attempt(self._loop, addrinfo)))
+                if not attempts:
+                    raise OSError('All connection attempts failed: ' + ', '.join(str(e) for e in errors))
+                # Start the next address after a short delay or as soon as an attempt fails
+                done, attempts = await asyncio.wait(attempts, timeout=None if exhausted else self._attempt_delay,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for attempt in done:
+                    if attempt.exception() is not None:
+                        errors.append(attempt.exception())
+                    elif winner is None:
+                        winner = attempt.result()
+                    else:
+                        attempt.result().close()
+                if winner is not None:
+                    return winner
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
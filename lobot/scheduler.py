@@ -0,0 +1,150 @@
+from asyncio import AbstractEventLoop, Future, Task
+from typing import Any, Callable, Optional, Union
+from collections import OrderedDict, deque
+from types import CoroutineType
+import asyncio
+
+
+__all__ = [
+    'TaskScheduler'
+]
+
+
+DEFAULT_MAX_TASKS = 256
+DEFAULT_MAX_TASKS_PER_OWNER = 16
+DEFAULT_MAX_BACKLOG = 1024
+
+
+class TaskScheduler(object):
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def backlog(self) -> int:
+        return self._backlog
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def errors(self) -> int:
+        return self._errors
+
+    def __init__(self, loop: AbstractEventLoop, max_tasks: int=DEFAULT_MAX_TASKS,
+                 max_tasks_per_owner: int=DEFAULT_MAX_TASKS_PER_OWNER, max_backlog: int=DEFAULT_MAX_BACKLOG,
+                 pause: Optional[Callable[[], None]]=None, resume: Optional[Callable[[], None]]=None):
+        self._loop = loop
+        self._max_tasks = max_tasks
+        self._max_tasks_per_owner = max_tasks_per_owner
+        self._max_backlog = max_backlog
+        self._pause = pause
+        self._resume = resume
+        self._paused = False
+        self._errors = 0
+        self._tasks = {}
+        self._owned = 0
+        self._counts = {}
+        # Per-owner queues, rotated so one busy plugin cannot starve the rest
+        self._queued = OrderedDict()
+        self._backlog = 0
+
+    def spawn(self, coro_or_future: Union[CoroutineType, Future], owner: Any=None, tag: Any=None):
+        # Core tasks (owner None) are tracked but never held back
+        if owner is None or self._has_capacity(owner):
+            self._start(coro_or_future, owner, tag)
+            return
+        queue = self._queued.get(owner)
+        if queue is None:
+            queue = self._queued[owner] = deque()
+        queue.append((coro_or_future, tag))
+        self._backlog += 1
+        if not self._paused and self._backlog >= self._max_backlog:
+            self._paused = True
+            if self._pause is not None:
+                self._pause()
+
+    def cancel(self, owner: Any=None, tag: Any=None):
+        # Cancels every owned task, or only those of one owner and/or tag
+        for queued_owner, queue in list(self._queued.items()):
+            if owner is not None and queued_owner != owner:
+                continue
+            kept = deque()
+            for coro_or_future, queued_tag in queue:
+                if tag is None or queued_tag == tag:
+                    self._discard(coro_or_future)
+                    self._backlog -= 1
+                else:
+                    kept.append((coro_or_future, queued_tag))
+            if kept:
+                self._queued[queued_owner] = kept
+            else:
+                del self._queued[queued_owner]
+        for task, (task_owner, task_tag) in list(self._tasks.items()):
+            if task_owner is None or (owner is not None and task_owner != owner):
+                continue
+            if tag is None or task_tag == tag:
+                task.cancel()
+        self._check_resume()
+
+    def _has_capacity(self, owner: Any) -> bool:
+        return self._owned < self._max_tasks and self._counts.get(owner, 0) < self._max_tasks_per_owner
+
+    def _start(self, coro_or_future: Union[CoroutineType, Future], owner: Any, tag: Any):
+        task = asyncio.ensure_future(coro_or_future, loop=self._loop)
+        self._tasks[task] = (owner, tag)
+        if owner is not None:
+            self._owned += 1
+            self._counts[owner] = self._counts.get(owner, 0) + 1
+        task.add_done_callback(self._done)
+
+    def _discard(self, coro_or_future: Union[CoroutineType, Future]):
+        if isinstance(coro_or_future, Future):
+            coro_or_future.cancel()
+        else:
+            # Close never-started coroutines so they do not warn about not being awaited
+            coro_or_future.close()
+
+    def _done(self, task: Task):
+        owner, _ = self._tasks.pop(task)
+        if owner is not None:
+            self._owned -= 1
+            count = self._counts[owner] - 1
+            if count:
+                self._counts[owner] = count
+            else:
+                del self._counts[owner]
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+            self._loop.call_exception_handler({
+                'message': 'Unhandled exception in task',
+                'exception': task.exception(),
+                'task': task
+            })
+        self._drain()
+
+    def _drain(self):
+        started = True
+        while started and self._queued and self._owned < self._max_tasks:
+            started = False
+            for owner in list(self._queued):
+                if not self._has_capacity(owner):
+                    continue
+                queue = self._queued[owner]
+                coro_or_future, tag = queue.popleft()
+                self._start(coro_or_future, owner, tag)
+                self._backlog -= 1
+                if queue:
+                    self._queued.move_to_end(owner)
+                else:
+                    del self._queued[owner]
+                started = True
+        self._check_resume()
+
+    def _check_resume(self):
+        # Hysteresis keeps reading from flapping around the threshold
+        if self._paused and self._backlog <= self._max_backlog // 2:
+            self._paused = False
+            if self._resume is not None:
+                self._resume()
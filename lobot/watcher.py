@@ -0,0 +1,135 @@
+from asyncio import AbstractEventLoop
+from typing import Callable, Dict, Set
+import ctypes.util
+import ctypes
+import struct
+import os
+
+
+__all__ = [
+    'FileWatcher'
+]
+
+
+DEFAULT_INTERVAL = 1.0
+# Editors save in several steps, changes are batched until they settle
+_SETTLE_DELAY = 0.2
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        # Not Linux, fall back to polling
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+class FileWatcher(object):
+    @property
+    def inotify(self) -> bool:
+        return self._fd is not None
+
+    def __init__(self, loop: AbstractEventLoop, paths: Dict[str, str], callback: Callable[[Set[str]], None],
+                 interval: float=DEFAULT_INTERVAL):
+        # Maps each watched file to the key reported for it
+        self._loop = loop
+        self._paths = {os.path.realpath(path): key for path, key in paths.items()}
+        self._callback = callback
+        self._interval = interval
+        self._fd = None
+        self._directories = {}
+        self._stats = {}
+        self._pending = set()
+        self._settle_handle = None
+        self._poll_handle = None
+
+    def start(self):
+        if not self._start_inotify():
+            self._stats = {path: self._stat(path) for path in self._paths}
+            self._poll_handle = self._loop.call_later(self._interval, self._poll)
+
+    def close(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        for handle in (self._settle_handle, self._poll_handle):
+            if handle is not None:
+                handle.cancel()
+        self._settle_handle = None
+        self._poll_handle = None
+
+    def _start_inotify(self) -> bool:
+        if _libc is None:
+            return False
+        fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return False
+        # Directories are watched rather than files so replace-by-rename saves are seen
+        for directory in {os.path.dirname(path) for path in self._paths}:
+            wd = _libc.inotify_add_watch(fd, directory.encode(), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE)
+            if wd < 0:
+                os.close(fd)
+                self._directories.clear()
+                return False
+            self._directories[wd] = directory
+        self._fd = fd
+        self._loop.add_reader(fd, self._read)
+        return True
+
+    def _read(self):
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0').decode(errors='replace')
+            pos += length
+            directory = self._directories.get(wd)
+            if directory is not None:
+                self._changed(os.path.join(directory, name))
+
+    def _stat(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _poll(self):
+        self._poll_handle = self._loop.call_later(self._interval, self._poll)
+        for path, old in self._stats.items():
+            new = self._stat(path)
+            if new != old:
+                self._stats[path] = new
+                self._changed(path)
+
+    def _changed(self, path: str):
+        key = self._paths.get(path)
+        if key is None:
+            return
+        self._pending.add(key)
+        if self._settle_handle is not None:
+            self._settle_handle.cancel()
+        self._settle_handle = self._loop.call_later(_SETTLE_DELAY, self._flush)
+
+    def _flush(self):
+        self._settle_handle = None
+        changed, self._pending = self._pending, set()
+        self._callback(changed)
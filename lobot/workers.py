@@ -0,0 +1,296 @@
+from asyncio import AbstractEventLoop, StreamReader
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import socket
+import struct
+import sys
+
+from .dispatcher import Dispatcher
+from .network import Network, network_configs
+from .irc.message import Message, MessageError
+
+
+__all__ = [
+    'WorkerPool',
+    'Worker'
+]
+
+
+# Frames are a 4 byte length, a 1 byte opcode and length-prefixed UTF-8 fields
+_HEADER = struct.Struct('!IB')
+_FIELD = struct.Struct('!I')
+_NONE = 0xffffffff
+
+# Main process to worker
+OP_CONNECTED = 1
+OP_DISCONNECTED = 2
+OP_NICK = 3
+OP_PRIVMSG = 4
+OP_JOIN = 5
+OP_STATE = 6
+OP_RELOAD = 7
+OP_MODULES = 8
+# Worker to main process
+OP_CALL = 16
+
+RESPAWN_DELAY = 1.0
+
+_ENTRY_POINT = 'from lobot.workers import main; main()'
+
+_CALLS = frozenset(('privmsg', 'kick', 'join', 'part', 'topic', 'nick'))
+
+
+def _encode_frame(opcode: int, *fields: Optional[str]) -> bytes:
+    parts = []
+    for field in fields:
+        if field is None:
+            parts.append(_FIELD.pack(_NONE))
+        else:
+            data = field.encode()
+            parts.append(_FIELD.pack(len(data)))
+            parts.append(data)
+    payload = b''.join(parts)
+    return _HEADER.pack(len(payload) + 1, opcode) + payload
+
+
+async def _read_frame(reader: StreamReader) -> Tuple[int, List[Optional[str]]]:
+    length, opcode = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    payload = await reader.readexactly(length - 1)
+    fields = []
+    pos = 0
+    while pos < len(payload):
+        size, = _FIELD.unpack_from(payload, pos)
+        pos += _FIELD.size
+        if size == _NONE:
+            fields.append(None)
+        else:
+            fields.append(payload[pos:pos + size].decode())
+            pos += size
+    return opcode, fields
+
+
+class _WorkerProcess(object):
+    @property
+    def modules(self) -> List[str]:
+        return self._modules
+
+    def __init__(self, pool: 'WorkerPool', modules: List[str]):
+        self._pool = pool
+        self._modules = modules
+        self._writer = None
+
+    def send(self, frame: bytes):
+        if self._writer is not None:
+            self._writer.write(frame)
+
+    def set_modules(self, modules: List[str]):
+        # Also what a respawned worker starts with
+        self._modules = modules
+        self.send(_encode_frame(OP_MODULES, *modules))
+
+    async def run(self):
+        while not self._pool.closed:
+            parent, child = socket.socketpair()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, '-c', _ENTRY_POINT, self._pool.working_dir, str(child.fileno()),
+                    *self._modules, pass_fds=(child.fileno(),))
+            finally:
+                child.close()
+            reader, writer = await asyncio.open_connection(sock=parent)
+            self._writer = writer
+            self._pool.resync(self)
+            try:
+                while True:
+                    opcode, fields = await _read_frame(reader)
+                    if opcode == OP_CALL:
+                        self._pool.on_call(fields[0], fields[1], fields[2:])
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                self._writer = None
+                writer.close()
+            await process.wait()
+            # A crashed worker only takes its own plugins down until it is restarted
+            await asyncio.sleep(RESPAWN_DELAY)
+
+
+class WorkerPool(object):
+    @property
+    def working_dir(self) -> str:
+        return self._working_dir
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __init__(self, loop: AbstractEventLoop, working_dir: str, modules: List[str], count: int,
+                 networks: Dict[str, Network], on_call: Callable[[str, str, List[Optional[str]]], None]):
+        self._loop = loop
+        self._working_dir = working_dir
+        self._networks = networks
+        self._on_call = on_call
+        self._closed = False
+        count = max(1, min(count, len(modules)))
+        # Modules are spread round-robin so each worker hosts a disjoint set of plugins
+        self._workers = [_WorkerProcess(self, modules[i::count]) for i in range(count)]
+        self._tasks = []
+
+    def start(self):
+        for worker in self._workers:
+            self._tasks.append(asyncio.ensure_future(worker.run(), loop=self._loop))
+
+    def close(self):
+        self._closed = True
+        for task in self._tasks:
+            task.cancel()
+
+    def on_call(self, network: str, name: str, args: List[Optional[str]]):
+        if name in _CALLS:
+            self._on_call(network, name, args)
+
+    def resync(self, worker: _WorkerProcess):
+        # A (re)started worker needs the connection state it missed
+        for network in self._networks.values():
+            worker.send(_encode_frame(OP_NICK, network.name, network.nick))
+            for line in network.state.replay(network.nick):
+                worker.send(_encode_frame(OP_STATE, network.name, line))
+            if network.proto is not None:
+                worker.send(_encode_frame(OP_CONNECTED, network.name))
+
+    def _broadcast(self, frame: bytes):
+        for worker in self._workers:
+            worker.send(frame)
+
+    def connected(self, network: str):
+        self._broadcast(_encode_frame(OP_CONNECTED, network))
+
+    def disconnected(self, network: str):
+        self._broadcast(_encode_frame(OP_DISCONNECTED, network))
+
+    def nick(self, network: str, nick: str):
+        self._broadcast(_encode_frame(OP_NICK, network, nick))
+
+    def reload(self, modules: List[str], changed: List[str]):
+        # Workers re-read config.json and reload those of the changed modules they host
+        self._broadcast(_encode_frame(OP_RELOAD, *changed))
+        hosted = set()
+        for worker in self._workers:
+            kept = [module for module in worker.modules if module in modules]
+            hosted.update(kept)
+            if len(kept) != len(worker.modules):
+                worker.set_modules(kept)
+        # New modules go to whichever workers host the fewest
+        for module in modules:
+            if module not in hosted:
+                worker = min(self._workers, key=lambda worker: len(worker.modules))
+                worker.set_modules(worker.modules + [module])
+
+    def state(self, network: str, message: Message):
+        # Workers keep their own trackers, fed with the same lines
+        self._broadcast(_encode_frame(OP_STATE, network, message.raw.decode(errors='replace')))
+
+    def privmsg(self, network: str, nick: str, target: str, message: str):
+        self._broadcast(_encode_frame(OP_PRIVMSG, network, nick, target, message))
+
+    def join(self, network: str, nick: str, channel: str):
+        self._broadcast(_encode_frame(OP_JOIN, network, nick, channel))
+
+
+class _ProtocolProxy(object):
+    # Stands in for IRCProtocol inside a worker, forwarding commands to the main process
+    def __init__(self, worker: 'Worker', network: str):
+        self._worker = worker
+        self._network = network
+
+    def _call(self, name: str, *args: Optional[str]):
+        self._worker.send(_encode_frame(OP_CALL, self._network, name, *args))
+
+    def cmd_kick(self, channel: str, nick: str, message: Optional[str]=None):
+        self._call('kick', channel, nick, message)
+
+    def cmd_join(self, channels: List[str], passwords: Optional[List[str]]=None):
+        self._call('join', ','.join(channels), ','.join(passwords) if passwords is not None else None)
+
+    def cmd_nick(self, nick: str):
+        self._call('nick', nick)
+
+    def cmd_part(self, channels: List[str], message: Optional[str]=None):
+        self._call('part', ','.join(channels), message)
+
+    def cmd_privmsg(self, target: str, message: str):
+        self._call('privmsg', target, message)
+
+    def cmd_topic(self, channel: str, message: Optional[str]=None):
+        self._call('topic', channel, message)
+
+
+class Worker(Dispatcher):
+    def __init__(self, loop: AbstractEventLoop, working_dir: str, sock: socket.socket, modules: List[str]):
+        super().__init__(loop, working_dir)
+        self._sock = sock
+        self._modules = modules
+        self._writer = None
+        for name, config in network_configs(self._config).items():
+            self._networks[name] = Network(name, config['nick'], _ProtocolProxy(self, name))
+
+    def send(self, frame: bytes):
+        self._writer.write(frame)
+
+    async def run(self):
+        reader, self._writer = await asyncio.open_connection(sock=self._sock)
+        await self._load_plugins(self._modules)
+        try:
+            while True:
+                opcode, fields = await _read_frame(reader)
+                if opcode == OP_RELOAD:
+                    self._reload(fields)
+                    continue
+                if opcode == OP_MODULES:
+                    self._set_modules(fields)
+                    continue
+                network = self._networks.get(fields[0])
+                if network is None:
+                    continue
+                if opcode == OP_PRIVMSG:
+                    self._dispatch_privmsg(network, *fields[1:])
+                elif opcode == OP_JOIN:
+                    self._dispatch_join(network, *fields[1:])
+                elif opcode == OP_NICK:
+                    network.set_nick(fields[1])
+                elif opcode == OP_STATE:
+                    self._track(network, fields[1])
+                elif opcode == OP_CONNECTED:
+                    self._dispatch_connected(network)
+                elif opcode == OP_DISCONNECTED:
+                    network.state.clear()
+                    self._dispatch_disconnected(network)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # The main process went away
+            pass
+
+    def _reload(self, modules: List[str]):
+        # Nick changes arrive as their own frames once the server confirms them
+        self._reload_config()
+        self._reload_modules([module for module in modules if module in self._modules])
+
+    def _set_modules(self, modules: List[str]):
+        old, self._modules = self._modules, modules
+        self._unload_modules([module for module in old if module not in modules])
+        self._reload_modules([module for module in modules if module not in old])
+        if self._watcher is not None:
+            self._watch_plugins()
+
+    def _track(self, network: Network, line: str):
+        try:
+            message = Message(line.encode())
+        except MessageError:
+            return
+        network.state.handle(message, network.nick)
+
+
+def main():
+    working_dir, fd, modules = sys.argv[1], int(sys.argv[2]), sys.argv[3:]
+    loop = asyncio.get_event_loop()
+    worker = Worker(loop, working_dir, socket.socket(fileno=fd), modules)
+    loop.run_until_complete(worker.run())
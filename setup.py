@@ -20,5 +20,5 @@ setup(name='lobot',
           'Development Status :: 3 - Alpha',
           'License :: OSI Approved :: MIT License',
           'Environment :: Console',
-          'Programming Language :: Python :: 3.5',
+          'Programming Language :: Python :: 3.7',
       ])
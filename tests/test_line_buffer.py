@@ -0,0 +1,48 @@
+import unittest
+
+from lobot.irc.protocol import _LineBuffer
+
+
+class LineBufferTest(unittest.TestCase):
+    def test_complete_lines(self):
+        buffer = _LineBuffer()
+        self.assertEqual(buffer.feed(b'PING :a\r\nPING :b\r\n'), [b'PING :a', b'PING :b'])
+        self.assertEqual(len(buffer), 0)
+
+    def test_line_split_across_reads(self):
+        buffer = _LineBuffer()
+        self.assertEqual(buffer.feed(b'PRIVMSG #a :hel'), [])
+        self.assertEqual(len(buffer), len(b'PRIVMSG #a :hel'))
+        self.assertEqual(buffer.feed(b'lo\r'), [])
+        self.assertEqual(buffer.feed(b'\nPING'), [b'PRIVMSG #a :hello'])
+        self.assertEqual(buffer.feed(b' :x\r\n'), [b'PING :x'])
+
+    def test_byte_at_a_time(self):
+        buffer = _LineBuffer()
+        lines = []
+        for byte in b'NICK a\r\nNICK b\n':
+            lines += buffer.feed(bytes((byte,)))
+        self.assertEqual(lines, [b'NICK a', b'NICK b'])
+
+    def test_bare_newline_and_empty_lines(self):
+        buffer = _LineBuffer()
+        self.assertEqual(buffer.feed(b'\r\n\nPING :a\n\r\n'), [b'PING :a'])
+
+    def test_overlong_line_is_dropped(self):
+        buffer = _LineBuffer(max_line_length=8)
+        self.assertEqual(buffer.feed(b'123456789'), [])
+        self.assertEqual(len(buffer), 0)
+        # The rest of the overlong line is discarded up to its terminator
+        self.assertEqual(buffer.feed(b'0123\r\nok\r\n'), [b'ok'])
+
+    def test_overlong_line_within_one_read(self):
+        buffer = _LineBuffer(max_line_length=4)
+        self.assertEqual(buffer.feed(b'toolong\r\nfine\r\n'), [b'fine'])
+
+    def test_line_at_the_limit(self):
+        buffer = _LineBuffer(max_line_length=4)
+        self.assertEqual(buffer.feed(b'four\r\n'), [b'four'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from lobot.irc.message import Message, MessageError
+
+
+class MessageTest(unittest.TestCase):
+    def test_command_only(self):
+        message = Message(b'PING')
+        self.assertEqual(message.command, 'PING')
+        self.assertEqual(message.args, [])
+        self.assertIsNone(message.prefix)
+        self.assertEqual(message.tags, {})
+
+    def test_middle_and_trailing_args(self):
+        message = Message(b'PRIVMSG #chan :hello there : friend')
+        self.assertEqual(message.command, 'PRIVMSG')
+        self.assertEqual(message.args, ['#chan', 'hello there : friend'])
+
+    def test_empty_trailing_arg(self):
+        self.assertEqual(Message(b'TOPIC #chan :').args, ['#chan', ''])
+
+    def test_repeated_spaces(self):
+        message = Message(b':srv  KICK   #chan  bob')
+        self.assertEqual(message.command, 'KICK')
+        self.assertEqual(message.args, ['#chan', 'bob'])
+
+    def test_arg_count_is_lazy(self):
+        message = Message(b':srv 372 lobot :- message of the day')
+        self.assertEqual(message.arg_count, 2)
+        self.assertIsNone(message._args)
+        self.assertEqual(Message(b'PING').arg_count, 0)
+        self.assertEqual(Message(b'KICK #a bob :bye').arg_count, 3)
+
+    def test_user_prefix(self):
+        prefix = Message(b':nick!user@host.example JOIN #chan').prefix
+        self.assertEqual(prefix.nick, 'nick')
+        self.assertEqual(prefix.username, 'user')
+        self.assertEqual(prefix.host, 'host.example')
+        self.assertEqual(prefix.raw, b'nick!user@host.example')
+
+    def test_server_prefix(self):
+        prefix = Message(b':irc.example.net 001 lobot :Welcome').prefix
+        self.assertIsNone(prefix.nick)
+        self.assertIsNone(prefix.username)
+        self.assertEqual(prefix.host, 'irc.example.net')
+
+    def test_nick_at_host_prefix(self):
+        prefix = Message(b':nick@host PART #chan').prefix
+        self.assertEqual(prefix.nick, 'nick')
+        self.assertIsNone(prefix.username)
+        self.assertEqual(prefix.host, 'host')
+
+    def test_tags(self):
+        message = Message(b'@time=2020-01-01T00:00:00Z;account=bob;+draft/x :bob!u@h PRIVMSG #a :hi')
+        self.assertEqual(message.tags, {'time': '2020-01-01T00:00:00Z', 'account': 'bob', '+draft/x': ''})
+        self.assertEqual(message.prefix.nick, 'bob')
+        self.assertEqual(message.command, 'PRIVMSG')
+        self.assertEqual(message.args, ['#a', 'hi'])
+
+    def test_tag_escapes(self):
+        message = Message(b'@a=one\\:two\\sthree\\\\\\r\\n;b=trail\\ PING')
+        self.assertEqual(message.tags, {'a': 'one;two three\\\r\n', 'b': 'trail'})
+
+    def test_tags_without_prefix(self):
+        message = Message(b'@id=1 PING :x')
+        self.assertEqual(message.tags, {'id': '1'})
+        self.assertIsNone(message.prefix)
+        self.assertEqual(message.args, ['x'])
+
+    def test_invalid_utf8_args(self):
+        self.assertEqual(Message(b'PRIVMSG #a :\xff').args, ['#a', '�'])
+
+    def test_raw(self):
+        self.assertEqual(Message(b'PING :x').raw, b'PING :x')
+
+    def test_malformed(self):
+        for data in (b'', b':prefixonly', b'@tagsonly', b':prefix ', b'@tags :prefix', b'\xff\xfe'):
+            with self.assertRaises(MessageError, msg=data):
+                Message(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
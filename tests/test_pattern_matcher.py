@@ -0,0 +1,82 @@
+import unittest
+import random
+import timeit
+import re
+
+from lobot.pattern_matcher import PatternMatcher, _required_literal
+
+
+def _plain_match(entries, message):
+    matches = []
+    matched = set()
+    for key, pattern in entries:
+        if key in matched:
+            continue
+        match = pattern.search(message)
+        if match:
+            matched.add(key)
+            matches.append((key, match))
+    return matches
+
+
+def _spans(matches):
+    return [(key, match.span(), match.groups()) for key, match in matches]
+
+
+_PIECES = ['ab', 'ba', 'abc', 'url', 'URL', 'http', 'x', 'a', '.', '.*', '\\s', '\\w+', '[ab]', '(?:ab|cd)', '(ab)',
+           '(c+)', 'b?', '^', '$', ' ', 'https?://']
+_WORDS = ['ab', 'abc', 'ba', 'cd', 'url', 'Url', 'http://', 'https://', 'x', ' ', 'c', 'AB']
+
+
+class PatternMatcherTest(unittest.TestCase):
+    def test_required_literal(self):
+        self.assertEqual(_required_literal(re.compile('^ping')), 'ping')
+        self.assertEqual(_required_literal(re.compile('(hello) world')), 'hello world')
+        self.assertEqual(_required_literal(re.compile('https?://')), 'http')
+        self.assertIsNone(_required_literal(re.compile('.*')))
+        self.assertIsNone(_required_literal(re.compile('a|b')))
+
+    def test_first_match_per_key(self):
+        entries = [('a', re.compile('foo')), ('a', re.compile('bar')), ('b', re.compile('bar'))]
+        matches = PatternMatcher(entries).match('bar foo')
+        self.assertEqual(_spans(matches), [('a', (4, 7), ()), ('b', (0, 3), ())])
+
+    def test_case_insensitive_literals(self):
+        entries = [('i', re.compile('hello', re.IGNORECASE)), ('s', re.compile('hello'))]
+        self.assertEqual([key for key, match in PatternMatcher(entries).match('HeLLo')], ['i'])
+
+    def test_overlapping_literals(self):
+        entries = [('short', re.compile('ab')), ('long', re.compile('abc')), ('mid', re.compile('bc'))]
+        matches = PatternMatcher(entries).match('xabcx')
+        self.assertEqual([key for key, match in matches], ['short', 'long', 'mid'])
+
+    def test_empty(self):
+        self.assertEqual(PatternMatcher([]).match('anything'), [])
+
+    def test_matches_plain_search(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            entries = []
+            for i in range(rng.randint(1, 8)):
+                pattern = ''.join(rng.choice(_PIECES) for _ in range(rng.randint(1, 4)))
+                flags = re.IGNORECASE if rng.random() < 0.3 else 0
+                entries.append((rng.randint(0, 4), re.compile(pattern, flags)))
+            matcher = PatternMatcher(entries)
+            for _ in range(20):
+                message = ''.join(rng.choice(_WORDS) for _ in range(rng.randint(0, 6)))
+                self.assertEqual(_spans(matcher.match(message)), _spans(_plain_match(entries, message)),
+                                 (entries, message))
+
+    def test_faster_than_plain_search(self):
+        rng = random.Random(0)
+        words = [''.join(rng.choice('abcdefghijklmnop') for _ in range(rng.randint(4, 9))) for _ in range(300)]
+        message = ' '.join(rng.choice(words[:20]) + 'zz' for _ in range(30))[:200]
+        entries = [(i, re.compile(word + r'\s+(\S+)', re.IGNORECASE if i % 2 else 0)) for i, word in enumerate(words)]
+        matcher = PatternMatcher(entries)
+        plain = min(timeit.repeat(lambda: _plain_match(entries, message), number=200, repeat=5))
+        prefiltered = min(timeit.repeat(lambda: matcher.match(message), number=200, repeat=5))
+        self.assertLess(prefiltered, plain)
+
+
+if __name__ == '__main__':
+    unittest.main()
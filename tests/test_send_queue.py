@@ -0,0 +1,51 @@
+import unittest
+
+from lobot.irc.send_queue import SendQueue
+
+
+class _FakeLoop(object):
+    def __init__(self):
+        self.now = 0.0
+        self.delays = []
+
+    def time(self) -> float:
+        return self.now
+
+    def call_soon(self, callback):
+        return None
+
+    def call_later(self, delay, callback):
+        self.delays.append(delay)
+        return None
+
+
+class SendQueueTest(unittest.TestCase):
+    def test_priority_debt_is_paid_before_queued_lines(self):
+        loop = _FakeLoop()
+        written = []
+        queue = SendQueue(loop, written.append, rate=1, burst=1)
+        queue.push_priority(b'a\r\n', b'b\r\n', b'c\r\n')
+        self.assertEqual(written, [b'a\r\nb\r\nc\r\n'])
+        queue.push(b'x\r\n')
+        queue._drain()
+        self.assertEqual(written, [b'a\r\nb\r\nc\r\n'])
+        self.assertEqual(queue._tokens, -2.0)
+        self.assertEqual(loop.delays, [3.0])
+        loop.now = 3.0
+        queue._drain()
+        self.assertEqual(written, [b'a\r\nb\r\nc\r\n', b'x\r\n'])
+        self.assertEqual(queue._tokens, 0.0)
+
+    def test_burst_then_throttle(self):
+        loop = _FakeLoop()
+        written = []
+        queue = SendQueue(loop, written.append, rate=0.5, burst=2)
+        for line in (b'1\r\n', b'2\r\n', b'3\r\n'):
+            queue.push(line)
+        queue._drain()
+        self.assertEqual(written, [b'1\r\n2\r\n'])
+        self.assertEqual(loop.delays, [2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()